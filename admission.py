@@ -0,0 +1,165 @@
+"""
+Control de admisión y load shedding por clase de endpoint.
+
+Cada clase tiene un límite de peticiones concurrentes y una cola acotada con
+plazo máximo de espera. Si la cola está llena, o la petición no consigue hueco
+antes del plazo, se responde al momento 503 con `Retry-After` en lugar de dejar
+que se acumule y arrastre a los demás endpoints.
+
+El ranking pesado (`/filter-compatible`) tiene su propio presupuesto, separado
+de las escrituras interactivas y de las lecturas, y los límites de las clases
+que usan la BD se eligen para no superar el pool de conexiones. Los trabajos
+por lotes (reconciliación, archivado) van en su propia clase, de uno en uno.
+`/health`, `/ready` y `/` nunca pasan por aquí.
+"""
+import asyncio
+import json
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionClass:
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_deadline = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for w in self._waiters if not w.done())
+
+    async def acquire(self) -> None:
+        if self.active < self.max_concurrency and not self.queued:
+            self.active += 1
+            self.admitted += 1
+            return
+        if self.queued >= self.max_queue:
+            self.shed_queue_full += 1
+            raise Overloaded("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # El hueco llegó justo al vencer el plazo: se pasa al siguiente
+                self.release()
+            self.shed_deadline += 1
+            raise Overloaded("deadline")
+        finally:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+        # release() ya nos traspasó su hueco: `active` no cambia
+        self.admitted += 1
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_timeout_s": self.queue_timeout,
+            "admitted": self.admitted,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_deadline": self.shed_deadline,
+        }
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        classes: Dict[str, AdmissionClass],
+        classify: Callable[[str, str], Optional[str]],
+        retry_after: int = 1,
+    ):
+        self.classes = classes
+        self.classify = classify
+        self.retry_after = retry_after
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: cls.stats() for name, cls in self.classes.items()}
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI puro (sin BaseHTTPMiddleware, que añade una tarea por petición)"""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        name = self.controller.classify(scope["method"], scope["path"])
+        cls = self.controller.classes.get(name) if name else None
+        if cls is None:
+            return await self.app(scope, receive, send)
+
+        try:
+            await cls.acquire()
+        except Overloaded as exc:
+            return await self._reject(send, cls.name, exc.reason)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            cls.release()
+
+    async def _reject(self, send, class_name: str, reason: str):
+        body = json.dumps({
+            "detail": "Servicio saturado, reintenta más tarde",
+            "admission_class": class_name,
+            "reason": reason,
+        }).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.controller.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# Escrituras interactivas de /matching (el resto de /matching son lecturas)
+_WRITE_ROUTES = ("/matching/swipe", "/matching/internal/users/delete")
+# Trabajos por lotes: con su propia clase para no ocupar huecos interactivos
+_BATCH_ROUTES = ("/matching/internal/counters/reconcile", "/matching/internal/swipes/archive")
+
+
+def classify_matching_request(method: str, path: str) -> Optional[str]:
+    if not path.startswith("/matching/"):
+        return None
+    if path.startswith("/matching/internal/") and path.endswith("/stats"):
+        return None
+    if path in ("/matching/filter-compatible", "/matching/internal/feature-snapshot"):
+        return "ranking"
+    if path in _BATCH_ROUTES:
+        return "batch"
+    if path in _WRITE_ROUTES or path.endswith("/dismatch"):
+        return "write"
+    return "read"
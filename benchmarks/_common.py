@@ -0,0 +1,40 @@
+"""
+Utilidades compartidas por los benchmarks.
+
+Se ejecutan desde la raíz del repo, p. ej. `python -m benchmarks.bench_lsh`.
+Si no hay `.env`, se usa una base SQLite local para poder importar los routers.
+"""
+import os
+import random
+import time
+from typing import Any, Dict, List
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("USER_SERVICE_URL", "http://localhost:8000")
+
+INTERESTS = [f"interest_{i}" for i in range(40)]
+
+
+def synthetic_profiles(n: int, seed: int = 42, first_id: int = 1) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    profiles = []
+    for pid in range(first_id, first_id + n):
+        profiles.append({
+            "id": pid,
+            "username": f"user{pid}",
+            "age": rng.randint(18, 60),
+            "gender_id": rng.choice([1, 2, 3]),
+            "sexual_orientation_id": rng.choice([0, 1, 2]),
+            "interests": rng.sample(INTERESTS, rng.randint(3, 8)),
+        })
+    return profiles
+
+
+def timed(fn, *args, repeat: int = 1, **kwargs):
+    """Devuelve (resultado de la última llamada, segundos medios por llamada)"""
+    result = None
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) / repeat
@@ -0,0 +1,70 @@
+"""
+Tiempo de import de `main`, tiempo hasta `/ready` y latencia de las primeras
+peticiones con y sin warm-up. Cada modo corre en un proceso nuevo.
+
+    python -m benchmarks.bench_cold_start
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import main
+import_ms = 1000 * (time.perf_counter() - t0)
+
+import warmup
+from db import Base
+if sys.argv[1] == "cold":
+    # Comportamiento anterior: solo la DDL, sin precalentar nada
+    warmup.warm_up = lambda engine, session_factory: Base.metadata.create_all(bind=engine) or {}
+
+from fastapi.testclient import TestClient
+
+ENDPOINTS = [
+    "/matching/excluded-users/1",
+    "/matching/relationships/check?user1_id=1&user2_id=2",
+    "/matching/relationships/user/1/active",
+    "/matching/likes/received/1",
+]
+
+t0 = time.perf_counter()
+with TestClient(main.app) as client:
+    while client.get("/ready").status_code != 200:
+        time.sleep(0.001)
+    ready_ms = 1000 * (time.perf_counter() - t0)
+    result = {"mode": sys.argv[1], "import_ms": round(import_ms, 2), "ready_ms": round(ready_ms, 2)}
+    for path in ENDPOINTS:
+        timings = []
+        for _ in range(2):
+            start = time.perf_counter()
+            client.get(path)
+            timings.append(round(1000 * (time.perf_counter() - start), 3))
+        result[path] = {"first_ms": timings[0], "second_ms": timings[1]}
+print(json.dumps(result))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.parse_args()
+
+    results = []
+    for mode in ("cold", "warm"):
+        tmp = tempfile.mkdtemp()
+        env = dict(os.environ)
+        env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tmp, 'cold_start.db')}")
+        env.setdefault("SECRET_KEY", "bench")
+        env.setdefault("USER_SERVICE_URL", "http://localhost:8000")
+        out = subprocess.run([sys.executable, "-c", CHILD, mode], env=env, check=True,
+                             capture_output=True, text=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
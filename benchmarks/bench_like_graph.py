@@ -0,0 +1,61 @@
+"""
+Latencia de "likes recibidos" / "likes mutuos" y memoria por arco del grafo CSR.
+
+    python -m benchmarks.bench_like_graph --users 200000 --likes 2000000
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks._common import timed
+
+from like_graph import LikeGraph
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--likes", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    edges = {(rng.randrange(args.users), rng.randrange(args.users)) for _ in range(args.likes)}
+    graph = LikeGraph()
+    _, build_s = timed(graph.load_edges, edges)
+
+    users = [rng.randrange(args.users) for _ in range(args.queries)]
+    _, received_s = timed(lambda: [graph.likes_received(u, 0, 50) for u in users])
+    _, mutual_s = timed(lambda: [graph.mutual_count(u) for u in users])
+
+    # Con delta pendiente (camino lento de fusión)
+    for _ in range(5_000):
+        graph.add_like(rng.randrange(args.users), rng.randrange(args.users))
+    _, received_delta_s = timed(lambda: [graph.likes_received(u, 0, 50) for u in users])
+
+    # Swipe más lento mientras se alcanza el umbral de compactación (que corre
+    # en segundo plano) y lo que tarda la compactación en sí
+    slowest_swipe_s = 0.0
+    for _ in range(graph.compact_threshold):
+        start = time.perf_counter()
+        graph.add_like(rng.randrange(args.users), rng.randrange(args.users))
+        slowest_swipe_s = max(slowest_swipe_s, time.perf_counter() - start)
+    _, compaction_wait_s = timed(graph.join_compaction)
+
+    print(json.dumps({
+        "likes": len(edges),
+        "build_s": round(build_s, 3),
+        "bytes_per_like": round(graph.nbytes() / len(edges), 2),
+        "likes_received_us": round(1e6 * received_s / len(users), 2),
+        "likes_received_with_delta_us": round(1e6 * received_delta_s / len(users), 2),
+        "mutual_count_us": round(1e6 * mutual_s / len(users), 2),
+        "slowest_swipe_ms": round(1000 * slowest_swipe_s, 3),
+        "compaction_wait_s": round(compaction_wait_s, 3),
+        "compactions": graph.compactions,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Recall@K y latencia del modo aproximado (MinHash/LSH) frente al ranking exacto
+con `jaccard_similarity`, y latencia extremo a extremo de `/filter-compatible`
+(el índice de cada versión de pool se construye una vez; las peticiones solo
+consultan).
+
+    python -m benchmarks.bench_lsh --pool 200000 --queries 50 --k 50
+"""
+import argparse
+import json
+import random
+
+from benchmarks._common import INTERESTS, synthetic_profiles, timed
+
+import lsh
+from routers import matching_router
+from routers.matching_router import jaccard_similarity
+
+CONFIGS = [(64, 32), (64, 16), (128, 64), (128, 32), (128, 16)]
+
+
+def exact_rank(profiles, interests):
+    scores = {p["id"]: jaccard_similarity(interests, p["interests"]) for p in profiles}
+    return scores
+
+
+def approx_rank(index, by_id, interests):
+    candidates = index.query(interests)
+    scored = [(pid, jaccard_similarity(interests, by_id[pid]["interests"])) for pid in candidates]
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return [pid for pid, _ in scored], len(candidates)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pool", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    profiles = synthetic_profiles(args.pool, seed=args.seed)
+    by_id = {p["id"]: p for p in profiles}
+    rng = random.Random(args.seed + 1)
+    queries = [rng.sample(INTERESTS, rng.randint(3, 8)) for _ in range(args.queries)]
+
+    exact_time = 0.0
+    exact_scores = []
+    for q in queries:
+        scores, elapsed = timed(exact_rank, profiles, q)
+        exact_scores.append(scores)
+        exact_time += elapsed
+
+    results = {"pool": args.pool, "k": args.k, "exact_ms": 1000 * exact_time / len(queries), "configs": []}
+    for num_perm, bands in CONFIGS:
+        index = lsh.LSHIndex(num_perm=num_perm, bands=bands)
+        _, build_s = timed(index.update, profiles)
+        recall = 0.0
+        approx_time = 0.0
+        candidates = 0
+        for q, scores in zip(queries, exact_scores):
+            (ranked, n_candidates), elapsed = timed(approx_rank, index, by_id, q)
+            approx_time += elapsed
+            candidates += n_candidates
+            recall += lsh.recall_at_k(scores, ranked, args.k)
+        results["configs"].append({
+            "num_perm": num_perm,
+            "bands": bands,
+            "rows": num_perm // bands,
+            "build_s": round(build_s, 3),
+            "approx_ms": round(1000 * approx_time / len(queries), 3),
+            "avg_candidates": candidates // len(queries),
+            f"recall_at_{args.k}": round(recall / len(queries), 4),
+        })
+
+    results["endpoint"] = endpoint_latency(profiles, queries, args.seed)
+    print(json.dumps(results, indent=2))
+
+
+def endpoint_latency(profiles, queries, seed):
+    """ms por petición; cada una con semilla distinta para no acertar en la caché de rankings"""
+    def request(i, interests, **options):
+        return {
+            "current_user": {"id": 0, "interests": interests},
+            "profiles": profiles,
+            "seed": seed + i,
+            **options,
+        }
+
+    def mean_ms(**options):
+        total = 0.0
+        for i, q in enumerate(queries):
+            _, elapsed = timed(matching_router.filter_compatible_profiles, request(i, q, **options))
+            total += elapsed
+        return round(1000 * total / len(queries), 3)
+
+    pool_version = f"bench-lsh-{len(profiles)}-{seed}"
+    # En el servicio esto ocurre en segundo plano tras la primera petición
+    _, build_s = timed(matching_router.get_lsh_index, pool_version, profiles, wait=True)
+    return {
+        "exact_ms": mean_ms(),
+        "index_build_s": round(build_s, 3),
+        "approx_ms": mean_ms(approximate=True, pool_version=pool_version),
+        # Sin versión no hay índice que reutilizar: se usa el ranking exacto
+        "approx_unversioned_ms": mean_ms(approximate=True),
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Latencia de `/filter-compatible` sin caché (pool sin versión), en fallo de
+caché y en acierto de caché (pool con `pool_version`), por tamaño de pool.
+
+    python -m benchmarks.bench_ranking_cache --pools 10000,100000 --repeat 5
+"""
+import argparse
+import json
+
+from benchmarks._common import synthetic_profiles, timed
+
+from routers import matching_router
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pools", default="10000,100000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    results = []
+    for pool in (int(p) for p in args.pools.split(",")):
+        profiles = synthetic_profiles(pool, seed=args.seed)
+        request = {
+            "current_user": {"id": 0, "sexual_orientation_id": 1, "interests": profiles[0]["interests"]},
+            "profiles": profiles,
+        }
+        _, uncached_s = timed(matching_router.filter_compatible_profiles, request, repeat=args.repeat)
+
+        miss_s = 0.0
+        for i in range(args.repeat):
+            # Versión nueva en cada vuelta: siempre fallo
+            versioned = {**request, "pool_version": f"miss-{pool}-{i}"}
+            _, elapsed = timed(matching_router.filter_compatible_profiles, versioned)
+            miss_s += elapsed
+        miss_s /= args.repeat
+
+        versioned = {**request, "pool_version": f"hit-{pool}"}
+        matching_router.filter_compatible_profiles(versioned)
+        _, hit_s = timed(matching_router.filter_compatible_profiles, versioned, repeat=args.repeat)
+
+        results.append({
+            "pool": pool,
+            "uncached_ms": round(1000 * uncached_s, 3),
+            "miss_ms": round(1000 * miss_s, 3),
+            "hit_ms": round(1000 * hit_s, 3),
+            "hit_speedup": round(uncached_s / hit_s, 1) if hit_s else None,
+        })
+        matching_router._ranking_cache.clear()
+
+    print(json.dumps({"results": results, "cache": matching_router._ranking_cache.stats()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
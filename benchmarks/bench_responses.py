@@ -0,0 +1,72 @@
+"""
+Bytes por respuesta y tiempo de codificación de `/filter-compatible` según la
+proyección (`fields` / `include_score`) y la codificación (identity, gzip y
+zstd si está instalado `zstandard`).
+
+    python -m benchmarks.bench_responses --pool 20000 --repeat 5
+"""
+import argparse
+import json
+
+from benchmarks._common import synthetic_profiles, timed
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import compression
+from config import settings
+from routers import matching_router
+
+MODES = [
+    ("full", False),
+    ("full", True),
+    ("scores", False),
+    ("ids", False),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pool", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    profiles = synthetic_profiles(args.pool, seed=args.seed)
+    request = {
+        "current_user": {"id": 0, "sexual_orientation_id": 1, "interests": profiles[0]["interests"]},
+        "profiles": profiles,
+        "pool_version": f"bench-{args.pool}-{args.seed}",
+    }
+    # Rellena la caché: el handler solo calcula la clave y proyecta
+    matching_router.filter_compatible_profiles(request)
+
+    results = {"pool": args.pool, "encodings": compression.available_encodings(), "modes": []}
+    for fields, include_score in MODES:
+        data = {**request, "fields": fields, "include_score": include_score}
+        payload, handler_s = timed(matching_router.filter_compatible_profiles, data, repeat=args.repeat)
+        # Lo mismo que hace FastAPI con el dict que devuelve el endpoint
+        body, render_s = timed(lambda: JSONResponse(jsonable_encoder(payload)).body, repeat=args.repeat)
+        entry = {
+            "fields": fields,
+            "include_score": include_score,
+            "handler_ms": round(1000 * handler_s, 3),
+            "json_encode_ms": round(1000 * render_s, 3),
+            "identity_bytes": len(body),
+        }
+        for encoding in compression.available_encodings():
+            compressed, compress_s = timed(
+                compression.compress, body, encoding,
+                settings.COMPRESSION_GZIP_LEVEL, settings.COMPRESSION_ZSTD_LEVEL,
+                repeat=args.repeat,
+            )
+            entry[f"{encoding}_bytes"] = len(compressed)
+            entry[f"{encoding}_ratio"] = round(len(compressed) / len(body), 4)
+            entry[f"{encoding}_encode_ms"] = round(1000 * compress_s, 3)
+        results["modes"].append(entry)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
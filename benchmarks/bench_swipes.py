@@ -0,0 +1,95 @@
+"""
+Swipes por segundo: camino síncrono actual de `/matching/swipe` frente al modo
+write-behind (log local + commits agrupados).
+
+    python -m benchmarks.bench_swipes --swipes 5000
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_swipes --database-url "$DATABASE_URL"
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+from datetime import datetime
+
+from benchmarks._common import timed
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from config import settings
+from db import Base
+import models, schemas
+from routers import matching_router
+from swipe_buffer import SwipeBuffer
+
+
+def make_session_factory(url):
+    engine = create_engine(url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    db.add(models.Relationship_State(state="active"))
+    db.add(models.Relationship_State(state="inactive"))
+    db.commit()
+    db.close()
+    return factory
+
+
+def run_swipes(factory, swipes):
+    db = factory()
+    for sender, receiver, is_like in swipes:
+        data = schemas.SwipeData(user_id=receiver, is_like=is_like, date=datetime.today())
+        matching_router.swipe_user(data, current_user_id=sender, db=db)
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--swipes", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    swipes = []
+    while len(swipes) < args.swipes:
+        sender, receiver = rng.randrange(args.users), rng.randrange(args.users)
+        if sender != receiver:
+            swipes.append((sender, receiver, rng.random() < 0.6))
+
+    tmp = tempfile.mkdtemp()
+    url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench_swipes.db')}"
+    results = {"swipes": args.swipes, "database": url.split(":", 1)[0]}
+
+    settings.SWIPE_WRITE_BEHIND = False
+    factory = make_session_factory(url)
+    _, elapsed = timed(run_swipes, factory, swipes)
+    results["sync_swipes_per_s"] = round(args.swipes / elapsed, 1)
+
+    for fsync in (True, False):
+        factory = make_session_factory(url)
+        buffer = SwipeBuffer(factory, os.path.join(tmp, f"swipes-{fsync}.log"),
+                             max_batch=settings.SWIPE_FLUSH_MAX_BATCH,
+                             flush_interval=settings.SWIPE_FLUSH_INTERVAL, fsync=fsync)
+        buffer.start()
+        settings.SWIPE_WRITE_BEHIND = True
+        matching_router._swipe_buffer = buffer
+
+        def buffered():
+            run_swipes(factory, swipes)
+            buffer.stop()  # incluye el último volcado
+
+        _, elapsed = timed(buffered)
+        settings.SWIPE_WRITE_BEHIND = False
+        matching_router._swipe_buffer = None
+        results[f"write_behind_fsync_{str(fsync).lower()}_swipes_per_s"] = round(args.swipes / elapsed, 1)
+        results[f"write_behind_fsync_{str(fsync).lower()}_flushes"] = buffer.flushes
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
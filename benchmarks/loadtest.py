@@ -0,0 +1,278 @@
+"""
+Generador de carga asíncrono con tráfico sintético de feed/swipe.
+
+Una población sintética de usuarios virtuales recorre una mezcla realista de
+llamadas (excluded-users + filter-compatible, swipe, check de relación y
+dismatch) contra una instancia local. Devuelve JSON con throughput, p50/p95/p99
+y tasa de error por endpoint. Con la misma `--seed` la secuencia de llamadas de
+cada usuario virtual es la misma.
+
+Solo swipean los `--users` primeros perfiles, así que los swipes apuntan sobre
+todo (`--peer-share`) a otros usuarios virtuales activos: si no, casi nunca
+habría likes recíprocos y los checks y dismatches no encontrarían matches.
+
+    # Instancia en proceso sobre SQLite temporal
+    python -m benchmarks.loadtest --users 50 --duration 30 --ramp linear --out results.json
+
+    # Instancia ya levantada (SQLite o Postgres local)
+    python -m benchmarks.loadtest --base-url http://localhost:8003 --users 200 --duration 60
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from benchmarks._common import synthetic_profiles
+
+import httpx
+
+DEFAULT_MIX = "feed=50,swipe=35,check=10,dismatch=5"
+RAMPS = ("constant", "linear", "step")
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("feed", "swipe", "check", "dismatch"):
+            raise ValueError(f"acción desconocida en --mix: {name}")
+        mix[name] = float(weight)
+    if not any(mix.values()):
+        raise ValueError("--mix necesita al menos un peso positivo")
+    return mix
+
+
+def start_offsets(users: int, ramp: str, ramp_up: float, steps: int = 4) -> List[float]:
+    """Segundo en el que arranca cada usuario virtual según el perfil de rampa"""
+    if ramp == "constant" or ramp_up <= 0:
+        return [0.0] * users
+    if ramp == "linear":
+        return [ramp_up * i / users for i in range(users)]
+    if ramp == "step":
+        per_step = max(1, -(-users // steps))
+        return [ramp_up * (i // per_step) / steps for i in range(users)]
+    raise ValueError(f"rampa desconocida: {ramp}")
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        # Acciones elegidas que no generaron petición (dismatch sin relación, swipe a uno mismo)
+        self.skipped: Dict[str, int] = defaultdict(int)
+
+    async def skip(self, name: str) -> None:
+        self.skipped[name] += 1
+        # Cede el event loop: sin ninguna espera, un mix como `dismatch=1`
+        # giraría en vacío hasta el deadline y bloquearía a los demás usuarios
+        await asyncio.sleep(0)
+
+    async def call(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            self.latencies[name].append(time.perf_counter() - start)
+            self.errors[name] += 1
+            self.statuses[name][type(exc).__name__] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - start)
+        self.statuses[name][str(response.status_code)] += 1
+        if response.status_code >= 500:
+            self.errors[name] += 1
+        return response
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = {}
+        for name, values in sorted(self.latencies.items()):
+            ordered = sorted(values)
+            endpoints[name] = {
+                "requests": len(ordered),
+                "errors": self.errors[name],
+                "error_rate": self.errors[name] / len(ordered),
+                "throughput_rps": len(ordered) / elapsed,
+                "p50_ms": 1000 * percentile(ordered, 50),
+                "p95_ms": 1000 * percentile(ordered, 95),
+                "p99_ms": 1000 * percentile(ordered, 99),
+                "status_codes": dict(self.statuses[name]),
+            }
+        total = sum(e["requests"] for e in endpoints.values())
+        errors = sum(e["errors"] for e in endpoints.values())
+        return {
+            "elapsed_s": elapsed,
+            "requests": total,
+            "throughput_rps": total / elapsed if elapsed else 0.0,
+            "error_rate": errors / total if total else 0.0,
+            "skipped": dict(self.skipped),
+            "endpoints": endpoints,
+        }
+
+
+def pick_target(rng, population, peers, peer_share):
+    """Otro usuario virtual activo con probabilidad `peer_share`; si no, cualquiera del pool"""
+    if peers and rng.random() < peer_share:
+        return rng.choice(peers)
+    return rng.choice(population)["id"]
+
+
+async def virtual_user(client, recorder, user, population, mix, rng, deadline, peers=None, peer_share=0.8):
+    actions, weights = zip(*mix.items())
+    relationships: List[int] = []
+    matched: List[int] = []
+    while time.perf_counter() < deadline:
+        action = rng.choices(actions, weights)[0]
+        uid = user["id"]
+        if action == "feed":
+            response = await recorder.call(client, "excluded-users", "GET", f"/matching/excluded-users/{uid}")
+            excluded = response.json().get("excluded_ids", []) if response is not None and response.status_code == 200 else []
+            await recorder.call(client, "filter-compatible", "POST", "/matching/filter-compatible", json={
+                "current_user": user,
+                "profiles": population,
+                "excluded_ids": excluded,
+                "seed": rng.randrange(1 << 16),
+            })
+        elif action == "swipe":
+            other = pick_target(rng, population, peers, peer_share)
+            if other == uid:
+                await recorder.skip("swipe")
+                continue
+            response = await recorder.call(
+                client, "swipe", "POST", "/matching/swipe",
+                params={"current_user_id": uid},
+                json={"user_id": other, "is_like": rng.random() < 0.6, "date": "2024-01-01T00:00:00"},
+            )
+            if response is not None and response.status_code == 201 and response.json().get("is_match"):
+                matched.append(other)
+        elif action == "check":
+            # Como en la app: sobre todo se comprueban los matches propios
+            other = matched.pop() if matched and rng.random() < 0.8 else pick_target(rng, population, peers, peer_share)
+            response = await recorder.call(
+                client, "relationship-check", "GET", "/matching/relationships/check",
+                params={"user1_id": uid, "user2_id": other},
+            )
+            if response is not None and response.status_code == 200:
+                body = response.json()
+                if body.get("exists") and body.get("state") == "active":
+                    relationships.append(body["relationship_id"])
+        elif action == "dismatch":
+            if not relationships:
+                await recorder.skip("dismatch")
+                continue
+            await recorder.call(
+                client, "dismatch", "POST", f"/matching/relationships/{relationships.pop()}/dismatch",
+                params={"current_user_id": uid},
+            )
+
+
+async def run(args) -> Dict[str, Any]:
+    mix = parse_mix(args.mix)
+    population = synthetic_profiles(args.population, seed=args.seed)
+    offsets = start_offsets(args.users, args.ramp, args.ramp_up)
+    recorder = Recorder()
+    peers = [population[i % len(population)]["id"] for i in range(args.users)]
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+
+    async def drive(client):
+        start = time.perf_counter()
+        deadline = start + args.duration
+
+        async def delayed(i):
+            await asyncio.sleep(offsets[i])
+            user = population[i % len(population)]
+            await virtual_user(
+                client, recorder, user, population, mix, random.Random(args.seed + i), deadline,
+                peers=[p for p in peers if p != user["id"]], peer_share=args.peer_share,
+            )
+
+        await asyncio.gather(*(delayed(i) for i in range(args.users)))
+        return time.perf_counter() - start
+
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+            elapsed = await drive(client)
+    else:
+        app, lifespan = _in_process_app(args.database_url)
+        async with lifespan(app):
+            transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+                while (await client.get("/ready")).status_code != 200:
+                    await asyncio.sleep(0.05)
+                elapsed = await drive(client)
+
+    report = recorder.report(elapsed)
+    report["config"] = {
+        "target": args.base_url or "in-process",
+        "users": args.users,
+        "population": args.population,
+        "duration_s": args.duration,
+        "ramp": args.ramp,
+        "ramp_up_s": args.ramp_up,
+        "mix": mix,
+        "peer_share": args.peer_share,
+        "seed": args.seed,
+    }
+    return report
+
+
+def _in_process_app(database_url: Optional[str]):
+    os.environ["DATABASE_URL"] = database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'loadtest.db')}"
+    import main
+    import models
+    from db import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        for state in ("active", "inactive"):
+            if not db.query(models.Relationship_State).filter(models.Relationship_State.state == state).first():
+                db.add(models.Relationship_State(state=state))
+        db.commit()
+    finally:
+        db.close()
+    return main.app, main.lifespan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=None, help="instancia ya levantada; sin esto se usa la app en proceso")
+    parser.add_argument("--database-url", default=None, help="BD de la app en proceso (por defecto SQLite temporal)")
+    parser.add_argument("--users", type=int, default=20, help="usuarios virtuales concurrentes")
+    parser.add_argument("--population", type=int, default=1000, help="perfiles sintéticos en el pool")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--ramp", choices=RAMPS, default="linear")
+    parser.add_argument("--ramp-up", type=float, default=5.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--peer-share", type=float, default=0.8,
+                        help="fracción de swipes/checks dirigidos a otros usuarios virtuales activos")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--out", default=None, help="fichero JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    else:
+        sys.stdout.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Compresión negociada (gzip / zstd) de las respuestas grandes.
+
+Se elige la codificación según `Accept-Encoding` del cliente: zstd si lo
+acepta y el paquete opcional `zstandard` está instalado, si no gzip (stdlib).
+Solo se comprimen respuestas de un único bloque con al menos `minimum_size`
+bytes y de un tipo que merezca la pena (JSON / texto); las respuestas en
+streaming se dejan pasar tal cual. Los cuerpos de `thread_threshold` bytes o
+más se comprimen en un hilo.
+
+Todas las respuestas llevan `Vary: Accept-Encoding`, también las que salen sin
+comprimir: si no, una caché intermedia podría servir a un cliente la variante
+negociada para otro.
+"""
+import gzip
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+import anyio.to_thread
+
+try:
+    import zstandard
+except ImportError:  # dependencia opcional
+    zstandard = None
+
+_COMPRESSIBLE_TYPES = (b"application/json", b"text/")
+
+
+def available_encodings() -> List[str]:
+    """Codificaciones soportadas, en orden de preferencia"""
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+
+def _accepted(accept_encoding: str) -> Dict[str, float]:
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, *params = [p.strip() for p in part.split(";")]
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name.lower()] = q
+    return accepted
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Mejor codificación aceptada por el cliente (por q y luego por preferencia), o None"""
+    if not accept_encoding:
+        return None
+    accepted = _accepted(accept_encoding)
+    best, best_q = None, 0.0
+    for encoding in available_encodings():
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _with_vary(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    """Añade Accept-Encoding al Vary existente (o crea la cabecera)"""
+    out, found = [], False
+    for name, value in headers:
+        if name.lower() == b"vary":
+            found = True
+            tokens = [t.strip().lower() for t in value.split(b",")]
+            if b"accept-encoding" not in tokens and b"*" not in tokens:
+                value = value + b", Accept-Encoding"
+        out.append((name, value))
+    if not found:
+        out.append((b"vary", b"Accept-Encoding"))
+    return out
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, zstd_level: int = 3) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=zstd_level).compress(body)
+    raise ValueError(f"codificación no soportada: {encoding}")
+
+
+class CompressionMiddleware:
+    """Middleware ASGI puro, como `admission.AdmissionMiddleware`"""
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        zstd_level: int = 3,
+        thread_threshold: int = 64 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_threshold = thread_threshold
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept_encoding = None
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate(accept_encoding)
+        if encoding is None:
+            async def send_with_vary(message):
+                if message["type"] == "http.response.start":
+                    message = {**message, "headers": _with_vary(message.get("headers", []))}
+                await send(message)
+
+            return await self.app(scope, receive, send_with_vary)
+
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = {**message, "headers": _with_vary(message.get("headers", []))}
+                return
+            if start_message is None or message["type"] != "http.response.body":
+                return await send(message)
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            if message.get("more_body", False) or not self._should_compress(start["headers"], body):
+                await send(start)
+                return await send(message)
+
+            encode = partial(compress, body, encoding, self.gzip_level, self.zstd_level)
+            if len(body) >= self.thread_threshold:
+                # Un pool grande tarda cientos de ms en comprimirse: fuera del
+                # event loop, para no bloquear /health ni el resto de peticiones
+                compressed = await anyio.to_thread.run_sync(encode)
+            else:
+                compressed = encode()
+            headers = [(k, v) for k, v in start["headers"] if k.lower() != b"content-length"]
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+            ]
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _should_compress(self, headers: List[Tuple[bytes, bytes]], body: bytes) -> bool:
+        if len(body) < self.minimum_size:
+            return False
+        content_type = b""
+        for name, value in headers:
+            name = name.lower()
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value.lower()
+        return content_type.startswith(_COMPRESSIBLE_TYPES)
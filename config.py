@@ -4,6 +4,75 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     SECRET_KEY: str
     USER_SERVICE_URL: str
+
+    # Modo aproximado (MinHash/LSH) de /matching/filter-compatible
+    LSH_NUM_PERM: int = 128
+    LSH_BANDS: int = 32
+    LSH_MIN_POOL_SIZE: int = 5000
+    # Índices LSH cacheados por versión de pool (solo con `pool_version`)
+    LSH_INDEX_CACHE_SIZE: int = 4
+    LSH_INDEX_MAX_PROFILES: int = 1_000_000
+
+    # Caché de rankings de /matching/filter-compatible
+    RANKING_CACHE_SIZE: int = 1024
+    RANKING_CACHE_MAX_PROFILES: int = 200_000
+
+    # Write-behind de /matching/swipe (log local + commits agrupados)
+    SWIPE_WRITE_BEHIND: bool = False
+    # Ruta base: cada worker escribe en `<ruta>.<pid>`
+    SWIPE_LOG_PATH: str = "swipe_buffer.log"
+    SWIPE_FLUSH_MAX_BATCH: int = 500
+    SWIPE_FLUSH_INTERVAL: float = 0.2
+    SWIPE_LOG_FSYNC: bool = True
+
+    # Recarga periódica del grafo de likes desde la BD, para ver los swipes de
+    # otros workers (0 = nunca; solo válido con un único worker)
+    LIKE_GRAPH_REFRESH_SECONDS: float = 30.0
+
+    # Snapshot binario de features (mmap compartido entre workers)
+    FEATURE_SNAPSHOT_PATH: str = "matching_features.bin"
+    FEATURE_SNAPSHOT_RECHECK_SECONDS: float = 1.0
+
+    # Reintentos del warm-up de arranque (backoff exponencial, sin límite de intentos)
+    WARMUP_RETRY_INITIAL_SECONDS: float = 0.5
+    WARMUP_RETRY_MAX_SECONDS: float = 30.0
+
+    # Control de admisión por clase de endpoint. Lecturas + escrituras + batch no
+    # deben superar el pool de la BD (pool_size + max_overflow = 15); el ranking no la usa.
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_RETRY_AFTER: int = 1
+    ADMISSION_RANKING_CONCURRENCY: int = 4
+    ADMISSION_RANKING_QUEUE: int = 32
+    ADMISSION_RANKING_TIMEOUT: float = 2.0
+    ADMISSION_WRITE_CONCURRENCY: int = 8
+    ADMISSION_WRITE_QUEUE: int = 128
+    ADMISSION_WRITE_TIMEOUT: float = 1.0
+    ADMISSION_READ_CONCURRENCY: int = 6
+    ADMISSION_READ_QUEUE: int = 128
+    ADMISSION_READ_TIMEOUT: float = 1.0
+    # Trabajos largos (reconciliación de contadores, archivado): uno a la vez y
+    # sin cola; si ya hay uno en marcha se responde 503 al momento
+    ADMISSION_BATCH_CONCURRENCY: int = 1
+    ADMISSION_BATCH_QUEUE: int = 0
+    ADMISSION_BATCH_TIMEOUT: float = 0.0
+
+    # Historial de swipes: ventana de "recientes" y retención en la tabla caliente
+    SWIPE_RECENT_WINDOW_DAYS: int = 7
+    SWIPE_RETENTION_DAYS: int = 180
+    SWIPE_ARCHIVE_BATCH_SIZE: int = 5000
+
+    # Máximo de usuarios por petición a /matching/stats
+    STATS_MAX_USERS: int = 500
+
+    # Compresión negociada (gzip, o zstd con `zstandard`, en requirements.txt;
+    # sin él solo gzip) de respuestas de al menos COMPRESSION_MINIMUM_SIZE bytes
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    # A partir de este tamaño se comprime en un hilo, fuera del event loop
+    COMPRESSION_THREAD_THRESHOLD: int = 64 * 1024
+
     model_config = SettingsConfigDict(env_file=".env")
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -0,0 +1,270 @@
+"""
+Contadores de matching por usuario (likes enviados/recibidos, matches y
+relación activa), mantenidos de forma incremental.
+
+Las funciones `record_*` solo añaden sentencias a la sesión del llamador: se
+confirman en el mismo commit que el cambio que las origina (swipe, dismatch,
+borrado de usuario, volcado del buffer write-behind o archivado).
+
+Definiciones (lo que `reconcile_counters` recalcula desde las tablas origen):
+  - likes_sent / likes_received: likes en la partición caliente `Swiped_Users`
+  - matches: filas de `Couple_Relationship` en las que participa el usuario
+    (incluye las rotas: el dismatch no las borra)
+  - active_relationship_fk: relación en estado "active" (la de menor id)
+
+`likes_sent_total` cuenta cada like dado y no baja con el dismatch ni con el
+archivado, igual que `matches` no baja con el dismatch; por eso `match_rate`
+es matches / likes_sent_total. No se puede recalcular desde las tablas (los
+likes de un dismatch se borran): la reconciliación solo lo sube hasta su cota
+inferior, max(likes_sent, matches).
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, or_, select, union
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+
+COUNTER_FIELDS = ("likes_sent", "likes_sent_total", "likes_received", "matches")
+_UPSERT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _add(db: Session, user_id: int, **deltas: int) -> None:
+    """Suma `deltas` a los contadores de `user_id`, creando la fila si no existe"""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    table = models.User_Match_Counters.__table__
+    insert = _UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+    if insert is not None:
+        # Upsert atómico: dos swipes concurrentes no chocan al crear la fila
+        stmt = insert(table).values(user_fk=user_id, **deltas).on_conflict_do_update(
+            index_elements=[table.c.user_fk],
+            set_={k: table.c[k] + v for k, v in deltas.items()},
+        )
+        db.execute(stmt)
+        return
+    updated = db.query(models.User_Match_Counters).filter(
+        models.User_Match_Counters.user_fk == user_id
+    ).update({getattr(models.User_Match_Counters, k): getattr(models.User_Match_Counters, k) + v
+              for k, v in deltas.items()}, synchronize_session=False)
+    if not updated:
+        db.add(models.User_Match_Counters(user_fk=user_id, **deltas))
+        db.flush()
+
+
+def _set_active(db: Session, user_id: int, relationship_id: int) -> None:
+    table = models.User_Match_Counters.__table__
+    insert = _UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+    if insert is not None:
+        stmt = insert(table).values(user_fk=user_id, active_relationship_fk=relationship_id).on_conflict_do_update(
+            index_elements=[table.c.user_fk],
+            set_={"active_relationship_fk": relationship_id},
+        )
+        db.execute(stmt)
+        return
+    updated = db.query(models.User_Match_Counters).filter(
+        models.User_Match_Counters.user_fk == user_id
+    ).update({models.User_Match_Counters.active_relationship_fk: relationship_id}, synchronize_session=False)
+    if not updated:
+        db.add(models.User_Match_Counters(user_fk=user_id, active_relationship_fk=relationship_id))
+        db.flush()
+
+
+def _clear_active(db: Session, user_id: int, relationship_id: int) -> None:
+    db.query(models.User_Match_Counters).filter(
+        models.User_Match_Counters.user_fk == user_id,
+        models.User_Match_Counters.active_relationship_fk == relationship_id
+    ).update({models.User_Match_Counters.active_relationship_fk: None}, synchronize_session=False)
+
+
+def record_swipe(db: Session, sender: int, receiver: int, old_is_like: Optional[bool], new_is_like: Optional[bool]) -> None:
+    """Un swipe pasa de `old_is_like` a `new_is_like` (None = no existe en la partición caliente)"""
+    delta = int(bool(new_is_like)) - int(bool(old_is_like))
+    if delta:
+        _add(db, sender, likes_sent=delta, likes_sent_total=max(delta, 0))
+        _add(db, receiver, likes_received=delta)
+
+
+def record_match(db: Session, user_a: int, user_b: int, relationship_id: int, new_row: bool = True) -> None:
+    """Relación activa entre dos usuarios (`new_row=False` si se reactivó una existente)"""
+    for user_id in (user_a, user_b):
+        if new_row:
+            _add(db, user_id, matches=1)
+        _set_active(db, user_id, relationship_id)
+
+
+def record_dismatch(db: Session, user_a: int, user_b: int, relationship_id: int) -> None:
+    for user_id in (user_a, user_b):
+        _clear_active(db, user_id, relationship_id)
+
+
+def record_user_deleted(db: Session, user_id: int) -> None:
+    """
+    Ajusta a las contrapartes antes de que el llamador borre los swipes y
+    relaciones del usuario, y elimina su propia fila de contadores.
+    """
+    likes = db.query(models.Swiped_Users.current_user_fk, models.Swiped_Users.swiped_user_fk).filter(
+        or_(
+            models.Swiped_Users.current_user_fk == user_id,
+            models.Swiped_Users.swiped_user_fk == user_id,
+        ),
+        models.Swiped_Users.is_like == True
+    ).all()
+    for sender, receiver in likes:
+        if sender == user_id and receiver != user_id:
+            _add(db, receiver, likes_received=-1)
+        elif receiver == user_id and sender != user_id:
+            _add(db, sender, likes_sent=-1)
+
+    relationships = db.query(models.Couple_Relationship).filter(
+        or_(
+            models.Couple_Relationship.first_user_fk == user_id,
+            models.Couple_Relationship.second_user_fk == user_id,
+        )
+    ).all()
+    for rel in relationships:
+        partner_id = rel.second_user_fk if rel.first_user_fk == user_id else rel.first_user_fk
+        _add(db, partner_id, matches=-1)
+        _clear_active(db, partner_id, rel.id)
+
+    db.query(models.User_Match_Counters).filter(
+        models.User_Match_Counters.user_fk == user_id
+    ).delete(synchronize_session=False)
+
+
+def get_counters(db: Session, user_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """Contadores de varios usuarios en una sola consulta (ceros si no hay fila)"""
+    user_ids = list(dict.fromkeys(user_ids))
+    rows = {
+        row.user_fk: row
+        for row in db.query(models.User_Match_Counters).filter(
+            models.User_Match_Counters.user_fk.in_(user_ids)
+        )
+    } if user_ids else {}
+    stats = {}
+    for user_id in user_ids:
+        row = rows.get(user_id)
+        likes_total = row.likes_sent_total if row else 0
+        matches = row.matches if row else 0
+        active = row.active_relationship_fk if row else None
+        stats[user_id] = {
+            "user_id": user_id,
+            "likes_sent": row.likes_sent if row else 0,
+            "likes_sent_total": likes_total,
+            "likes_received": row.likes_received if row else 0,
+            "matches": matches,
+            "match_rate": matches / likes_total if likes_total > 0 else 0.0,
+            "has_active_relationship": active is not None,
+            "active_relationship_id": active,
+        }
+    return stats
+
+
+def _actual_counters(db: Session, user_ids: List[int], active_state_id: Optional[int]) -> Dict[int, Dict[str, Any]]:
+    actual = {u: {"likes_sent": 0, "likes_received": 0, "matches": 0, "active_relationship_fk": None} for u in user_ids}
+    S = models.Swiped_Users
+    R = models.Couple_Relationship
+
+    for column, field in ((S.current_user_fk, "likes_sent"), (S.swiped_user_fk, "likes_received")):
+        for user_id, count in db.query(column, func.count()).filter(
+            column.in_(user_ids), S.is_like == True
+        ).group_by(column):
+            actual[user_id][field] = count
+
+    for column in (R.first_user_fk, R.second_user_fk):
+        for user_id, count in db.query(column, func.count()).filter(column.in_(user_ids)).group_by(column):
+            actual[user_id]["matches"] += count
+        if active_state_id is not None:
+            for user_id, rel_id in db.query(column, func.min(R.id)).filter(
+                column.in_(user_ids), R.state_fk == active_state_id
+            ).group_by(column):
+                current = actual[user_id]["active_relationship_fk"]
+                actual[user_id]["active_relationship_fk"] = rel_id if current is None else min(current, rel_id)
+    return actual
+
+
+def reconcile_counters(db: Session, batch_size: int = 1000, dry_run: bool = False, sample_size: int = 20) -> Dict[str, Any]:
+    """
+    Recalcula los contadores desde las tablas origen por lotes de usuarios
+    (paginación por id, un commit por lote) e informa de la deriva encontrada.
+
+    Las filas del lote se bloquean (FOR UPDATE) antes de contar, así que un
+    swipe concurrente espera a nuestro commit y suma encima. Las que ya tiene
+    bloqueadas un swipe en curso se saltan (SKIP LOCKED, sin interbloqueos) y
+    quedan para la siguiente pasada. Las filas que aún no existen se crean con
+    un upsert de la diferencia, que respeta la que cree a la vez un swipe.
+    """
+    S = models.Swiped_Users
+    R = models.Couple_Relationship
+    C = models.User_Match_Counters
+    # El conjunto de ids se calcula una sola vez (un UNION por lote haría el
+    # trabajo cuadrático en el tamaño de las tablas); son enteros, caben en memoria
+    all_users = sorted(row[0] for row in db.execute(union(
+        select(S.current_user_fk),
+        select(S.swiped_user_fk),
+        select(R.first_user_fk),
+        select(R.second_user_fk),
+        select(C.user_fk),
+    )))
+
+    active_state = db.query(models.Relationship_State).filter(models.Relationship_State.state == "active").first()
+    active_state_id = active_state.id if active_state else None
+
+    report: Dict[str, Any] = {
+        "users_checked": 0,
+        "users_skipped": 0,
+        "users_drifted": 0,
+        "drift": {field: 0 for field in COUNTER_FIELDS + ("active_relationship_fk",)},
+        "sample": [],
+        "dry_run": dry_run,
+    }
+    for start in range(0, len(all_users), batch_size):
+        user_ids = all_users[start:start + batch_size]
+        query = db.query(C).filter(C.user_fk.in_(user_ids)).order_by(C.user_fk)
+        if not dry_run:
+            query = query.with_for_update(skip_locked=True)
+        stored = {row.user_fk: row for row in query}
+        if not dry_run:
+            # Sin fila puede ser que no exista o que esté bloqueada: se distingue sin bloquear
+            existing = {u for (u,) in db.query(C.user_fk).filter(C.user_fk.in_(user_ids))}
+            skipped = existing - stored.keys()
+            if skipped:
+                report["users_skipped"] += len(skipped)
+                user_ids = [u for u in user_ids if u not in skipped]
+        actual = _actual_counters(db, user_ids, active_state_id)
+        for user_id in user_ids:
+            expected = actual[user_id]
+            row = stored.get(user_id)
+            current = {
+                field: getattr(row, field) if row else (None if field == "active_relationship_fk" else 0)
+                for field in expected
+            }
+            current["likes_sent_total"] = row.likes_sent_total if row else 0
+            expected["likes_sent_total"] = max(current["likes_sent_total"], expected["likes_sent"], expected["matches"])
+            if current == expected:
+                continue
+            report["users_drifted"] += 1
+            for field in COUNTER_FIELDS:
+                report["drift"][field] += abs(expected[field] - current[field])
+            if expected["active_relationship_fk"] != current["active_relationship_fk"]:
+                report["drift"]["active_relationship_fk"] += 1
+            if len(report["sample"]) < sample_size:
+                report["sample"].append({"user_id": user_id, "stored": current, "actual": expected})
+            if dry_run:
+                continue
+            if row is None:
+                _add(db, user_id, **{field: expected[field] for field in COUNTER_FIELDS})
+                if expected["active_relationship_fk"] is not None:
+                    _set_active(db, user_id, expected["active_relationship_fk"])
+            else:
+                # Fila bloqueada: nadie la cambia hasta nuestro commit
+                for field, value in expected.items():
+                    setattr(row, field, value)
+        report["users_checked"] += len(user_ids)
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+    return report
@@ -0,0 +1,204 @@
+"""
+Snapshot binario de las features de matching, compartido entre workers de
+uvicorn vía `mmap` de solo lectura (las páginas viven una vez en la page cache
+del SO, no una vez por worker).
+
+Formato (little-endian, secciones alineadas a 8 bytes):
+
+    cabecera   magic b"PMFS", version u32, n_users u32, n_words u32,
+               vocab_size u32, build_id u64
+    user_ids   int32[n_users]            ordenados
+    gender_id  int32[n_users]            -1 = desconocido
+    so_id      int32[n_users]            -1 = desconocido
+    interests  uint64[n_users * n_words] bitset por usuario (bit i = vocab[i])
+    vocab      por cada interés: u32 longitud + utf-8
+
+Las reconstrucciones escriben un fichero temporal y lo renombran encima del
+anterior (`os.replace` es atómico), así que un lector nunca ve un fichero a medias.
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+MAGIC = b"PMFS"
+VERSION = 1
+_HEADER = struct.Struct("<4sIIIIQ")
+UNKNOWN = -1
+_INT32_MIN, _INT32_MAX = -(1 << 31), (1 << 31) - 1
+
+
+def _align8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _is_int32(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and _INT32_MIN <= value <= _INT32_MAX
+
+
+def _as_int(value: Any) -> int:
+    return value if _is_int32(value) else UNKNOWN
+
+
+def write_snapshot(path: str, profiles: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Escribe el snapshot de forma atómica y devuelve un resumen. Lanza
+    ValueError si algún id no cabe en int32 (el formato los guarda así).
+    """
+    by_id: Dict[int, Dict[str, Any]] = {}
+    out_of_range: List[int] = []
+    for profile in profiles:
+        pid = profile.get("id")
+        if isinstance(pid, int) and not isinstance(pid, bool):
+            if not _is_int32(pid):
+                out_of_range.append(pid)
+                continue
+            by_id[pid] = profile
+    if out_of_range:
+        raise ValueError(f"ids fuera del rango int32 del snapshot: {sorted(out_of_range)[:10]}")
+    user_ids = sorted(by_id)
+
+    vocab: Dict[str, int] = {}
+    for pid in user_ids:
+        for interest in by_id[pid].get("interests", []) or []:
+            vocab.setdefault(str(interest), len(vocab))
+    n_words = max(1, (len(vocab) + 63) // 64)
+
+    ids_bytes = struct.pack(f"<{len(user_ids)}i", *user_ids)
+    genders = struct.pack(f"<{len(user_ids)}i", *(_as_int(by_id[p].get("gender_id")) for p in user_ids))
+    orientations = struct.pack(
+        f"<{len(user_ids)}i", *(_as_int(by_id[p].get("sexual_orientation_id")) for p in user_ids)
+    )
+    bitsets = bytearray()
+    for pid in user_ids:
+        bits = 0
+        for interest in by_id[pid].get("interests", []) or []:
+            bits |= 1 << vocab[str(interest)]
+        bitsets += bits.to_bytes(8 * n_words, "little")
+    vocab_bytes = bytearray()
+    for word in sorted(vocab, key=vocab.get):
+        encoded = word.encode("utf-8")
+        vocab_bytes += struct.pack("<I", len(encoded)) + encoded
+
+    build_id = time.time_ns()
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(user_ids), n_words, len(vocab), build_id))
+        for section in (ids_bytes, genders, orientations, bytes(bitsets), bytes(vocab_bytes)):
+            f.write(b"\0" * (_align8(f.tell()) - f.tell()))
+            f.write(section)
+        f.flush()
+        os.fsync(f.fileno())
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return {"users": len(user_ids), "vocab": len(vocab), "bytes": size, "version": str(build_id)}
+
+
+class FeatureSnapshot:
+    """Vista de solo lectura sobre un snapshot mapeado en memoria"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        buf = memoryview(self._mmap)
+
+        magic, version, n, n_words, vocab_size, build_id = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} no es un snapshot de features válido")
+        self.n_users = n
+        self.n_words = n_words
+        self.version = str(build_id)
+
+        offset = _align8(_HEADER.size)
+
+        def section(size: int, fmt: str) -> memoryview:
+            nonlocal offset
+            view = buf[offset:offset + size].cast(fmt)
+            offset = _align8(offset + size)
+            return view
+
+        self.user_ids = section(4 * n, "i")
+        self.gender_ids = section(4 * n, "i")
+        self.orientation_ids = section(4 * n, "i")
+        self._bitsets = section(8 * n * n_words, "B")
+        self._words = self._bitsets.cast("Q")
+
+        # El vocabulario es pequeño: se decodifica una vez por worker
+        self.vocab: List[str] = []
+        for _ in range(vocab_size):
+            (length,) = struct.unpack_from("<I", buf, offset)
+            self.vocab.append(bytes(buf[offset + 4:offset + 4 + length]).decode("utf-8"))
+            offset += 4 + length
+        self._vocab_index = {word: bit for bit, word in enumerate(self.vocab)}
+
+    def __len__(self) -> int:
+        return self.n_users
+
+    def index_of(self, user_id: int) -> Optional[int]:
+        i = bisect_left(self.user_ids, user_id)
+        if i < self.n_users and self.user_ids[i] == user_id:
+            return i
+        return None
+
+    def interest_bits(self, row: int) -> int:
+        if self.n_words == 1:
+            return self._words[row]
+        start = 8 * self.n_words * row
+        return int.from_bytes(self._bitsets[start:start + 8 * self.n_words], "little")
+
+    def encode_interests(self, interests: Iterable[Any]) -> Tuple[int, int]:
+        """(bitset de los intereses conocidos, nº de intereses fuera del vocabulario)"""
+        bits = 0
+        unknown = 0
+        for interest in set(str(i) for i in interests):
+            bit = self._vocab_index.get(interest)
+            if bit is None:
+                unknown += 1
+            else:
+                bits |= 1 << bit
+        return bits, unknown
+
+    def interests(self, row: int) -> List[str]:
+        bits = self.interest_bits(row)
+        return [word for bit, word in enumerate(self.vocab) if bits >> bit & 1]
+
+    def profile(self, row: int) -> Dict[str, Any]:
+        gender_id = self.gender_ids[row]
+        orientation_id = self.orientation_ids[row]
+        return {
+            "id": self.user_ids[row],
+            "gender_id": None if gender_id == UNKNOWN else gender_id,
+            "sexual_orientation_id": None if orientation_id == UNKNOWN else orientation_id,
+            "interests": self.interests(row),
+        }
+
+
+_snapshots: Dict[str, Tuple[Optional[FeatureSnapshot], float]] = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_snapshot(path: str, recheck_seconds: float = 1.0) -> Optional[FeatureSnapshot]:
+    """
+    Snapshot actual de `path`. Como mucho cada `recheck_seconds` se comprueba si
+    el fichero se ha sustituido y, si es así, se mapea el nuevo. El mapeo viejo
+    se libera cuando ninguna petición en curso lo referencia.
+    """
+    now = time.monotonic()
+    with _snapshots_lock:
+        snapshot, checked_at = _snapshots.get(path, (None, float("-inf")))
+        if now - checked_at < recheck_seconds:
+            return snapshot
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            _snapshots[path] = (None, now)
+            return None
+        if snapshot is None or snapshot.identity != (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+            snapshot = FeatureSnapshot(path)
+        _snapshots[path] = (snapshot, now)
+        return snapshot
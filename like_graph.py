@@ -0,0 +1,304 @@
+"""
+Grafo de likes en memoria en formato CSR, guardado en ambos sentidos
+(likes enviados y recibidos) sobre `array('i')`.
+
+Cada sentido usa tres arrays de enteros de 4 bytes:
+  - `nodes`:   ids de usuario con al menos un arco, ordenados (4 B por nodo)
+  - `offsets`: inicio de la fila de cada nodo en `targets` (4 B por nodo + 4 B)
+  - `targets`: ids destino de cada fila, ordenados (4 B por arco)
+Es decir, ~8 bytes por like (4 por sentido) más ~16 bytes por usuario.
+
+Los swipes nuevos se guardan en un delta pequeño (sets de altas y bajas) que se
+fusiona con el CSR al leer y se compacta al superar `compact_threshold`.
+
+Con varios workers cada proceso solo aplica al delta los swipes que atiende él;
+`refresh()` recarga el CSR desde la BD (el router la lanza cada
+LIKE_GRAPH_REFRESH_SECONDS) para ver también los de los demás.
+
+La compactación corre en un hilo aparte: bajo el lock solo se copia el delta;
+los CSR nuevos se construyen sin él (los `_Csr` no se modifican nunca) y al
+final se intercambian bajo el lock, restando del delta vivo lo ya fusionado.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+import models
+
+Edge = Tuple[int, int]
+Delta = Tuple[Dict[int, Set[int]], ...]
+
+
+class _Csr:
+    __slots__ = ("nodes", "offsets", "targets")
+
+    def __init__(self, rows: Dict[int, Iterable[int]]):
+        self.nodes = array("i")
+        self.offsets = array("i", [0])
+        self.targets = array("i")
+        for node in sorted(rows):
+            row = sorted(set(rows[node]))
+            if not row:
+                continue
+            self.nodes.append(node)
+            self.targets.extend(row)
+            self.offsets.append(len(self.targets))
+
+    def _bounds(self, node: int) -> Tuple[int, int]:
+        i = bisect_left(self.nodes, node)
+        if i == len(self.nodes) or self.nodes[i] != node:
+            return 0, 0
+        return self.offsets[i], self.offsets[i + 1]
+
+    def row(self, node: int) -> array:
+        start, end = self._bounds(node)
+        return self.targets[start:end]
+
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in (self.nodes, self.offsets, self.targets))
+
+
+class LikeGraph:
+    def __init__(self, compact_threshold: int = 10_000, background: bool = True):
+        self.compact_threshold = compact_threshold
+        self.background = background
+        self.loaded = False
+        self._out = _Csr({})
+        self._in = _Csr({})
+        # Delta sobre el CSR: altas y bajas indexadas en ambos sentidos
+        self._added_out: Dict[int, Set[int]] = defaultdict(set)
+        self._added_in: Dict[int, Set[int]] = defaultdict(set)
+        self._removed_out: Dict[int, Set[int]] = defaultdict(set)
+        self._removed_in: Dict[int, Set[int]] = defaultdict(set)
+        self._delta_size = 0
+        self._lock = threading.Lock()
+        # Cada carga del snapshot invalida una compactación en curso
+        self._generation = 0
+        self._compacting = False
+        self._compaction_thread: Optional[threading.Thread] = None
+        self.compactions = 0
+        self.loaded_at = 0.0  # time.monotonic() de la última carga desde la BD
+        self.refreshes = 0
+
+    # ------------------------------------------------------------------ carga
+
+    @staticmethod
+    def _build(edges: Iterable[Edge]) -> Tuple[_Csr, _Csr]:
+        out_rows: Dict[int, List[int]] = defaultdict(list)
+        in_rows: Dict[int, List[int]] = defaultdict(list)
+        for sender, receiver in edges:
+            out_rows[sender].append(receiver)
+            in_rows[receiver].append(sender)
+        return _Csr(out_rows), _Csr(in_rows)
+
+    def load_edges(self, edges: Iterable[Edge]) -> None:
+        """Reconstruye el CSR; el delta acumulado se conserva y sigue aplicándose encima"""
+        out_csr, in_csr = self._build(edges)
+        with self._lock:
+            self._out, self._in = out_csr, in_csr
+            self._generation += 1
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+
+    @staticmethod
+    def _query_likes(db: Session, batch_size: int):
+        rows = db.query(
+            models.Swiped_Users.current_user_fk,
+            models.Swiped_Users.swiped_user_fk
+        ).filter(models.Swiped_Users.is_like == True).yield_per(batch_size)
+        return ((sender, receiver) for sender, receiver in rows)
+
+    def load(self, db: Session, batch_size: int = 10_000) -> None:
+        """Carga el snapshot de likes de `Swiped_Users`"""
+        self.load_edges(self._query_likes(db, batch_size))
+
+    def refresh(self, db: Session, batch_size: int = 10_000) -> None:
+        """
+        Recarga el CSR desde la BD sin bloquear las lecturas. El delta marcado
+        antes de empezar ya está confirmado (el router aplica los swipes tras el
+        commit), así que se descarta; lo marcado durante la recarga se conserva.
+        """
+        with self._lock:
+            frozen = self._freeze_deltas()
+        out_csr, in_csr = self._build(self._query_likes(db, batch_size))
+        with self._lock:
+            self._out, self._in = out_csr, in_csr
+            self._generation += 1
+            self._subtract_locked(frozen)
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+            self.refreshes += 1
+
+    # ------------------------------------------------------------------ actualización
+
+    def _mark(self, sender: int, receiver: int, add: bool) -> None:
+        target, other = (
+            (self._added_out, self._removed_out) if add else (self._removed_out, self._added_out)
+        )
+        target[sender].add(receiver)
+        other[sender].discard(receiver)
+        target, other = (
+            (self._added_in, self._removed_in) if add else (self._removed_in, self._added_in)
+        )
+        target[receiver].add(sender)
+        other[receiver].discard(sender)
+        self._delta_size += 1
+
+    def add_like(self, sender: int, receiver: int) -> None:
+        with self._lock:
+            self._mark(sender, receiver, add=True)
+            job = self._claim_compaction()
+        self._start_compaction(job)
+
+    def remove_like(self, sender: int, receiver: int) -> None:
+        with self._lock:
+            self._mark(sender, receiver, add=False)
+            job = self._claim_compaction()
+        self._start_compaction(job)
+
+    def apply_swipe(self, sender: int, receiver: int, is_like: bool) -> None:
+        if is_like:
+            self.add_like(sender, receiver)
+        else:
+            self.remove_like(sender, receiver)
+
+    def remove_user(self, user_id: int) -> None:
+        with self._lock:
+            for receiver in self._out_row(user_id):
+                self._mark(user_id, receiver, add=False)
+            for sender in self._in_row(user_id):
+                self._mark(sender, user_id, add=False)
+            job = self._claim_compaction()
+        self._start_compaction(job)
+
+    # ------------------------------------------------------------------ compactación
+
+    def _deltas(self) -> Delta:
+        return (self._added_out, self._added_in, self._removed_out, self._removed_in)
+
+    def _claim_compaction(self, force: bool = False) -> Optional[tuple]:
+        """Con el lock tomado: copia lo necesario para compactar sin él"""
+        # Antes de la carga inicial el delta tiene que sobrevivir al snapshot
+        if not self.loaded or self._compacting:
+            return None
+        if not force and self._delta_size < self.compact_threshold:
+            return None
+        self._compacting = True
+        return self._generation, self._out, self._in, self._freeze_deltas()
+
+    def _freeze_deltas(self) -> Delta:
+        return tuple({node: set(row) for node, row in delta.items() if row} for delta in self._deltas())
+
+    def _subtract_locked(self, frozen: Delta) -> None:
+        """
+        Quita del delta vivo lo que ya recoge el CSR nuevo: lo que siga igual que
+        en la copia `frozen`; lo que cambió después se queda en el delta.
+        """
+        for live, merged in zip(self._deltas(), frozen):
+            for node, row in merged.items():
+                current = live.get(node)
+                if current:
+                    current -= row
+                    if not current:
+                        del live[node]
+        self._delta_size = sum(len(row) for row in self._added_out.values()) + \
+            sum(len(row) for row in self._removed_out.values())
+
+    def _start_compaction(self, job: Optional[tuple]) -> None:
+        if job is None:
+            return
+        if self.background:
+            self._compaction_thread = threading.Thread(
+                target=self._compact, args=(job,), name="like-graph-compaction", daemon=True
+            )
+            self._compaction_thread.start()
+        else:
+            self._compact(job)
+
+    def _compact(self, job: tuple) -> None:
+        generation, out_csr, in_csr, frozen = job
+        added_out, added_in, removed_out, removed_in = frozen
+        try:
+            out_rows = {
+                node: self._merge(out_csr.row(node), added_out.get(node, ()), removed_out.get(node, ()))
+                for node in set(out_csr.nodes) | set(added_out)
+            }
+            in_rows = {
+                node: self._merge(in_csr.row(node), added_in.get(node, ()), removed_in.get(node, ()))
+                for node in set(in_csr.nodes) | set(added_in)
+            }
+            new_out, new_in = _Csr(out_rows), _Csr(in_rows)
+            with self._lock:
+                if generation != self._generation:
+                    return
+                self._out, self._in = new_out, new_in
+                self._subtract_locked(frozen)
+                self.compactions += 1
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def compact(self) -> None:
+        """Compacta ya, en el hilo del llamador (warm-up, mantenimiento, tests)"""
+        with self._lock:
+            job = self._claim_compaction(force=True)
+        if job is not None:
+            self._compact(job)
+
+    def join_compaction(self, timeout: Optional[float] = None) -> None:
+        thread = self._compaction_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    # ------------------------------------------------------------------ lectura
+
+    @staticmethod
+    def _merge(base: array, added: Set[int], removed: Set[int]) -> List[int]:
+        if not added and not removed:
+            return base.tolist()
+        row = [x for x in base if x not in removed]
+        if added:
+            row = sorted(set(row) | added)
+        return row
+
+    def _out_row(self, node: int) -> List[int]:
+        return self._merge(self._out.row(node), self._added_out.get(node, ()), self._removed_out.get(node, ()))
+
+    def _in_row(self, node: int) -> List[int]:
+        return self._merge(self._in.row(node), self._added_in.get(node, ()), self._removed_in.get(node, ()))
+
+    def likes_received(self, user_id: int, skip: int = 0, limit: int = 50) -> Tuple[List[int], int]:
+        """Página de ids (ordenados) que dieron like a `user_id` y el total"""
+        with self._lock:
+            if not self._added_in.get(user_id) and not self._removed_in.get(user_id):
+                # Camino rápido: solo se copia la página pedida del CSR
+                start, end = self._in._bounds(user_id)
+                page = self._in.targets[min(start + skip, end):min(start + skip + limit, end)]
+                return page.tolist(), end - start
+            row = self._in_row(user_id)
+            return row[skip:skip + limit], len(row)
+
+    def likes_sent(self, user_id: int) -> List[int]:
+        with self._lock:
+            return self._out_row(user_id)
+
+    def mutual_count(self, user_id: int) -> int:
+        """Nº de usuarios con like en ambos sentidos con `user_id`"""
+        with self._lock:
+            out_row = self._out_row(user_id)
+            if not out_row:
+                return 0
+            return len(set(out_row).intersection(self._in_row(user_id)))
+
+    def edge_count(self) -> int:
+        with self._lock:
+            return sum(len(self._out_row(node)) for node in set(self._out.nodes) | set(self._added_out))
+
+    def nbytes(self) -> int:
+        """Bytes de los arrays CSR (sin contar el delta pendiente de compactar)"""
+        return self._out.nbytes() + self._in.nbytes()
@@ -0,0 +1,154 @@
+"""
+Índice MinHash/LSH para el modo aproximado de `/matching/filter-compatible`.
+
+Cada perfil se resume en una firma MinHash de `num_perm` valores y la firma se
+parte en `bands` bandas de `num_perm // bands` filas. Dos perfiles caen en el
+mismo bucket de una banda cuando coinciden todas sus filas, lo que ocurre con
+probabilidad ~ J^rows (J = similitud de Jaccard). Más bandas => más recall y
+más candidatos que re-puntuar; más filas por banda => menos candidatos.
+"""
+import random
+import threading
+import zlib
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Primo de Mersenne 2^61 - 1 para las permutaciones (a*x + b) mod P
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        if num_perm <= 0:
+            raise ValueError("num_perm debe ser positivo")
+        self.num_perm = num_perm
+        rng = random.Random(seed)
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+        # El vocabulario de intereses es pequeño: cacheamos el vector de hashes
+        # de cada interés y la firma de un conjunto es el mínimo elemento a elemento.
+        self._token_cache: Dict[str, Tuple[int, ...]] = {}
+
+    def _token_hashes(self, token: str) -> Tuple[int, ...]:
+        hashes = self._token_cache.get(token)
+        if hashes is None:
+            # crc32 es estable entre procesos (hash() de str no lo es)
+            x = zlib.crc32(token.encode("utf-8"))
+            hashes = tuple((a * x + b) % _MERSENNE_PRIME for a, b in self._perms)
+            self._token_cache[token] = hashes
+        return hashes
+
+    def signature(self, interests: Iterable[Any]) -> Optional[Tuple[int, ...]]:
+        """Firma MinHash de un conjunto de intereses (None si está vacío)"""
+        vectors = [self._token_hashes(str(token)) for token in set(interests)]
+        if not vectors:
+            return None
+        if len(vectors) == 1:
+            return vectors[0]
+        return tuple(map(min, *vectors))
+
+
+def estimate_jaccard(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+    if not sig_a or not sig_b:
+        return 0.0
+    equal = sum(1 for a, b in zip(sig_a, sig_b) if a == b)
+    return equal / len(sig_a)
+
+
+class LSHIndex:
+    """
+    Índice de buckets LSH por id de perfil. Es seguro entre hilos: los endpoints
+    síncronos de FastAPI se ejecutan en el threadpool.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        if bands <= 0 or num_perm % bands != 0:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+        self.hasher = MinHasher(num_perm=num_perm, seed=seed)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets: List[Dict[Tuple[int, ...], Set[int]]] = [{} for _ in range(bands)]
+        self._interests: Dict[int, FrozenSet[str]] = {}
+        self._signatures: Dict[int, Tuple[int, ...]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._interests)
+
+    def __contains__(self, pid: int) -> bool:
+        return pid in self._interests
+
+    def _band_keys(self, sig: Tuple[int, ...]):
+        r = self.rows
+        for band in range(self.bands):
+            yield band, sig[band * r:(band + 1) * r]
+
+    def _remove_locked(self, pid: int) -> None:
+        self._interests.pop(pid, None)
+        sig = self._signatures.pop(pid, None)
+        if sig is None:
+            return
+        for band, key in self._band_keys(sig):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(pid)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def _add_locked(self, pid: int, interests: Iterable[Any]) -> None:
+        fs = frozenset(str(i) for i in interests)
+        if self._interests.get(pid) == fs:
+            return
+        self._remove_locked(pid)
+        self._interests[pid] = fs
+        sig = self.hasher.signature(fs)
+        if sig is None:
+            return
+        self._signatures[pid] = sig
+        for band, key in self._band_keys(sig):
+            self._buckets[band].setdefault(key, set()).add(pid)
+
+    def add(self, pid: int, interests: Iterable[Any]) -> None:
+        """Inserta o actualiza un perfil; si sus intereses no cambian no hace nada"""
+        with self._lock:
+            self._add_locked(pid, interests)
+
+    def update(self, profiles: Iterable[Dict[str, Any]]) -> None:
+        """Inserta o actualiza muchos perfiles tomando el lock una sola vez"""
+        with self._lock:
+            for profile in profiles:
+                pid = profile.get("id")
+                if pid is not None:
+                    self._add_locked(pid, profile.get("interests", []) or [])
+
+    def remove(self, pid: int) -> None:
+        with self._lock:
+            self._remove_locked(pid)
+
+    def query(self, interests: Iterable[Any]) -> Set[int]:
+        """Ids que comparten al menos un bucket con `interests`"""
+        sig = self.hasher.signature(str(i) for i in interests)
+        if sig is None:
+            return set()
+        candidates: Set[int] = set()
+        with self._lock:
+            for band, key in self._band_keys(sig):
+                bucket = self._buckets[band].get(key)
+                if bucket:
+                    candidates |= bucket
+        return candidates
+
+
+def recall_at_k(exact_scores: Dict[int, float], approx_ranked: Sequence[int], k: int) -> float:
+    """
+    Recall@K del ranking aproximado frente al exacto. Con empates en el corte,
+    cualquier id con puntuación >= a la K-ésima exacta cuenta como acierto.
+    """
+    if k <= 0 or not exact_scores:
+        return 1.0
+    k = min(k, len(exact_scores))
+    threshold = sorted(exact_scores.values(), reverse=True)[k - 1]
+    hits = sum(1 for pid in approx_ranked[:k] if exact_scores.get(pid, 0.0) >= threshold)
+    return hits / k
@@ -1,14 +1,100 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from db import Base, engine, SessionLocal
+from fastapi.responses import JSONResponse
+from config import settings
+from db import engine, SessionLocal
 from routers import matching_router
+import admission
+import compression
 import models
+import warmup
+
+
+async def _warm_up(app: FastAPI):
+    # La BD puede no estar lista al arrancar (docker-compose levanta Postgres a
+    # la vez): se reintenta con backoff exponencial hasta que funcione.
+    delay = settings.WARMUP_RETRY_INITIAL_SECONDS
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            timings = await asyncio.to_thread(warmup.warm_up, engine, SessionLocal)
+        except Exception as exc:
+            matching_router.logger.exception(f"[warmup] attempt {attempt} failed, retrying in {delay}s")
+            app.state.warmup = {"error": str(exc), "attempts": attempt, "retry_in_s": delay}
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.WARMUP_RETRY_MAX_SECONDS)
+            continue
+        app.state.warmup = {**timings, "attempts": attempt}
+        app.state.ready = True
+        return
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nada pesado en tiempo de import: la DDL, el pool y las cachés se preparan
+    # aquí, en segundo plano, y /ready avisa cuando han terminado.
+    app.state.ready = False
+    app.state.warmup = None
+    task = asyncio.create_task(_warm_up(app))
+    yield
+    app.state.ready = False
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    matching_router.close_swipe_buffer()
 
-app = FastAPI(title="Matching Service")
 
-Base.metadata.create_all(bind=engine)
+app = FastAPI(title="Matching Service", lifespan=lifespan)
 
 app.include_router(matching_router.router)
 
+admission_controller = admission.AdmissionController(
+    {
+        "ranking": admission.AdmissionClass(
+            "ranking",
+            settings.ADMISSION_RANKING_CONCURRENCY,
+            settings.ADMISSION_RANKING_QUEUE,
+            settings.ADMISSION_RANKING_TIMEOUT,
+        ),
+        "write": admission.AdmissionClass(
+            "write",
+            settings.ADMISSION_WRITE_CONCURRENCY,
+            settings.ADMISSION_WRITE_QUEUE,
+            settings.ADMISSION_WRITE_TIMEOUT,
+        ),
+        "read": admission.AdmissionClass(
+            "read",
+            settings.ADMISSION_READ_CONCURRENCY,
+            settings.ADMISSION_READ_QUEUE,
+            settings.ADMISSION_READ_TIMEOUT,
+        ),
+        "batch": admission.AdmissionClass(
+            "batch",
+            settings.ADMISSION_BATCH_CONCURRENCY,
+            settings.ADMISSION_BATCH_QUEUE,
+            settings.ADMISSION_BATCH_TIMEOUT,
+        ),
+    },
+    admission.classify_matching_request,
+    retry_after=settings.ADMISSION_RETRY_AFTER,
+)
+# Se añade antes que la admisión para que esta quede por fuera y rechace sin comprimir
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        compression.CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        zstd_level=settings.COMPRESSION_ZSTD_LEVEL,
+        thread_threshold=settings.COMPRESSION_THREAD_THRESHOLD,
+    )
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(admission.AdmissionMiddleware, controller=admission_controller)
+
 
 @app.get("/")
 def read_root():
@@ -16,5 +102,20 @@ def read_root():
 
 
 @app.get("/health")
-def health_check():
+async def health_check():
     return {"status": "healthy", "service": "matching"}
+
+
+@app.get("/internal/admission/stats")
+async def admission_stats():
+    return admission_controller.stats()
+
+
+@app.get("/ready")
+async def readiness_check():
+    if not getattr(app.state, "ready", False):
+        return JSONResponse(
+            status_code=503,
+            content={"status": "warming", "service": "matching", "warmup": getattr(app.state, "warmup", None)},
+        )
+    return {"status": "ready", "service": "matching", "warmup": app.state.warmup}
@@ -22,9 +22,34 @@ class Relationship_State(Base):
     state = Column(String(10), nullable=False)
     
 class Swiped_Users(Base):
+    # Partición caliente: solo swipes dentro de SWIPE_RETENTION_DAYS
     __tablename__ = "Swiped_Users"
     
     current_user_fk = Column(Integer, primary_key=True, index=True)
     swiped_user_fk = Column(Integer, primary_key=True, index=True)
     is_like = Column(Boolean, nullable=False)
+    swipe_date = Column(DateTime, nullable=False, index=True)
+
+
+class Swiped_Users_Archive(Base):
+    # Partición fría: swipes más antiguos que la retención (ver swipe_retention.py)
+    __tablename__ = "Swiped_Users_Archive"
+    
+    current_user_fk = Column(Integer, primary_key=True)
+    swiped_user_fk = Column(Integer, primary_key=True, index=True)
+    is_like = Column(Boolean, nullable=False)
     swipe_date = Column(DateTime, nullable=False)
+
+
+class User_Match_Counters(Base):
+    # Contadores por usuario mantenidos por counters.py (sobre la partición caliente)
+    __tablename__ = "User_Match_Counters"
+    
+    user_fk = Column(Integer, primary_key=True)
+    likes_sent = Column(Integer, nullable=False, default=0)
+    # Likes dados en total: no baja con el dismatch ni con el archivado (base de match_rate)
+    likes_sent_total = Column(Integer, nullable=False, default=0)
+    likes_received = Column(Integer, nullable=False, default=0)
+    matches = Column(Integer, nullable=False, default=0)
+    active_relationship_fk = Column(Integer, nullable=True)
+    update = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -0,0 +1,114 @@
+"""
+Caché acotada (LRU) de rankings de `/matching/filter-compatible`.
+
+La clave incluye al usuario, sus preferencias e intereses, la versión del pool de
+candidatos y la versión del conjunto de excluidos, así que cualquier cambio en
+los datos de entrada produce una clave nueva y no hace falta invalidar a mano.
+
+La versión del pool la aporta el llamador (`pool_version`) o el snapshot de
+features; sin ella no se cachea (clave None). Calcularla aquí en cada petición
+cuesta más que el propio ranking en pools grandes.
+"""
+import hashlib
+import json
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+
+def pool_version(profiles: Iterable[Dict[str, Any]]) -> str:
+    """
+    Hash del contenido del pool, para quien llama (los perfiles se devuelven tal
+    cual, así que cuenta todo). El servicio no lo calcula por petición.
+    """
+    payload = json.dumps(list(profiles), sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def excluded_version(excluded_ids: Iterable[Any]) -> str:
+    payload = ",".join(sorted(str(i) for i in set(excluded_ids)))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+_TIE_STRUCT = struct.Struct("<qqq")
+
+
+def tie_breaker(seed: int, user_id: Any, profile_id: Any) -> int:
+    """
+    Desempate determinista: misma semilla y mismo usuario => mismo orden entre
+    perfiles con igual puntuación, también entre workers. No usa hash(): con
+    ids de texto depende de PYTHONHASHSEED, distinto en cada proceso.
+    """
+    try:
+        payload = _TIE_STRUCT.pack(seed, user_id, profile_id)
+    except (struct.error, TypeError):
+        payload = repr((seed, user_id, profile_id)).encode("utf-8")
+    # crc32 y no blake2b: se llama una vez por perfil y basta con que sea estable
+    return zlib.crc32(payload)
+
+
+class RankingCache:
+    def __init__(self, maxsize: int = 1024, max_profiles: int = 200_000):
+        self.maxsize = maxsize
+        self.max_profiles = max_profiles
+        self._data: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._profiles = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bypassed = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Optional[Hashable]) -> Optional[Any]:
+        """`key=None` significa petición no cacheable: no cuenta como fallo"""
+        with self._lock:
+            if key is None:
+                self.bypassed += 1
+                return None
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Optional[Hashable], value: Any, weight: int = 1) -> None:
+        """`weight` es el nº de perfiles retenidos por la entrada"""
+        if key is None or self.maxsize <= 0 or weight > self.max_profiles:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._profiles -= old[1]
+            self._data[key] = (value, weight)
+            self._profiles += weight
+            while len(self._data) > self.maxsize or self._profiles > self.max_profiles:
+                _, (_, evicted_weight) = self._data.popitem(last=False)
+                self._profiles -= evicted_weight
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._profiles = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "cached_profiles": self._profiles,
+                "max_profiles": self.max_profiles,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "bypassed": self.bypassed,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
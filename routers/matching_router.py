@@ -1,23 +1,143 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Dict, Any
 import logging
-import random
-
-from db import get_db
+import threading
+import time
+
+from config import settings
+from db import SessionLocal, get_db
+import counters
+import feature_snapshot
+import like_graph
+import lsh
 import models, schemas
+import ranking_cache
+import swipe_buffer
+import swipe_retention
 
 # Use uvicorn logger so logs show up in docker-compose logs reliably
 logger = logging.getLogger("uvicorn.error")
 
 router = APIRouter(prefix="/matching", tags=["Matching"])
 
+# Índices MinHash/LSH del modo aproximado, uno por versión de pool: se
+# construyen una vez y cada petición solo hace query(). LRU acotada por nº de
+# índices y de perfiles indexados.
+_lsh_indexes = ranking_cache.RankingCache(
+    maxsize=settings.LSH_INDEX_CACHE_SIZE,
+    max_profiles=settings.LSH_INDEX_MAX_PROFILES,
+)
+# Un solo constructor a la vez (cada índice ocupa CPU y memoria durante
+# segundos): mientras trabaja solo se guarda la última versión pedida
+_lsh_build_lock = threading.Lock()
+_lsh_state_lock = threading.Lock()
+_lsh_building: Any = None
+_lsh_pending: Any = None  # (pool_ver, profiles) o None
+_lsh_builder: Any = None  # hilo constructor en curso
+
+# Rankings ya calculados (reintentos, app resumes, doble tap...)
+_ranking_cache = ranking_cache.RankingCache(
+    maxsize=settings.RANKING_CACHE_SIZE,
+    max_profiles=settings.RANKING_CACHE_MAX_PROFILES,
+)
+
+# Ids de Relationship_State por nombre (datos de referencia, se precargan en el warm-up)
+_state_ids: Dict[str, int] = {}
+
+
+def get_state_id(db: Session, state_name: str) -> int | None:
+    state_id = _state_ids.get(state_name)
+    if state_id is None:
+        state = db.query(models.Relationship_State).filter(
+            models.Relationship_State.state == state_name
+        ).first()
+        if state is None:
+            return None
+        state_id = _state_ids[state_name] = state.id
+    return state_id
+
+
+# Grafo de likes en memoria; se carga del snapshot de la BD en el primer uso y
+# los swipes lo actualizan de forma incremental desde el arranque.
+_like_graph = like_graph.LikeGraph()
+_like_graph_lock = threading.Lock()
+
+
+_like_graph_refreshing = False
+
+
+def _refresh_like_graph() -> None:
+    global _like_graph_refreshing
+    db = SessionLocal()
+    try:
+        _like_graph.refresh(db)
+    except Exception:
+        logger.exception("[like-graph] refresh failed")
+    finally:
+        db.close()
+        with _like_graph_lock:
+            _like_graph_refreshing = False
+
+
+def get_like_graph(db: Session) -> like_graph.LikeGraph:
+    """
+    Carga el grafo la primera vez y, con varios workers, lo recarga desde la BD
+    en segundo plano cada LIKE_GRAPH_REFRESH_SECONDS (cada worker solo aplica en
+    memoria los swipes que atiende él). Mientras tanto se sirve el anterior.
+    """
+    global _like_graph_refreshing
+    if not _like_graph.loaded:
+        with _like_graph_lock:
+            if not _like_graph.loaded:
+                _like_graph.load(db)
+    elif 0 < settings.LIKE_GRAPH_REFRESH_SECONDS <= time.monotonic() - _like_graph.loaded_at:
+        with _like_graph_lock:
+            if _like_graph_refreshing:
+                return _like_graph
+            _like_graph_refreshing = True
+        threading.Thread(target=_refresh_like_graph, name="like-graph-refresh", daemon=True).start()
+    return _like_graph
+
+
+# Buffer write-behind de swipes (solo si SWIPE_WRITE_BEHIND está activo)
+_swipe_buffer: swipe_buffer.SwipeBuffer | None = None
+_swipe_buffer_lock = threading.Lock()
+
+
+def get_swipe_buffer() -> swipe_buffer.SwipeBuffer | None:
+    global _swipe_buffer
+    if not settings.SWIPE_WRITE_BEHIND:
+        return None
+    with _swipe_buffer_lock:
+        if _swipe_buffer is None:
+            buffer = swipe_buffer.SwipeBuffer(
+                SessionLocal,
+                settings.SWIPE_LOG_PATH,
+                max_batch=settings.SWIPE_FLUSH_MAX_BATCH,
+                flush_interval=settings.SWIPE_FLUSH_INTERVAL,
+                fsync=settings.SWIPE_LOG_FSYNC,
+            )
+            buffer.start()  # Reproduce el log si el proceso anterior murió
+            _swipe_buffer = buffer
+    return _swipe_buffer
+
+
+def close_swipe_buffer() -> None:
+    """Vuelca lo pendiente y para el hilo del buffer (apagado del servicio)"""
+    global _swipe_buffer
+    with _swipe_buffer_lock:
+        if _swipe_buffer is not None:
+            _swipe_buffer.stop()
+            _swipe_buffer = None
+
 @router.get("/excluded-users/{current_user_id}")
 def get_excluded_users(
     current_user_id: int,
     only_recent: bool = Query(default=True, description="Solo excluir swipes recientes"),
+    recent_days: int | None = Query(default=None, ge=1, description="Ventana de 'recientes' en días"),
     db: Session = Depends(get_db)
 ):
     query = db.query(models.Swiped_Users.swiped_user_fk).filter(
@@ -25,25 +145,28 @@ def get_excluded_users(
     ).order_by(models.Swiped_Users.swipe_date.desc())
     
     if only_recent:
-        already_swiped = query.limit(10).all()
+        # Ventana de tiempo sobre la partición caliente (antes era un limit(10) fijo)
+        window = timedelta(days=recent_days or settings.SWIPE_RECENT_WINDOW_DAYS)
+        already_swiped = query.filter(models.Swiped_Users.swipe_date >= datetime.today() - window).all()
     else:
-        already_swiped = query.all()
+        # Historial completo: partición caliente + archivo
+        already_swiped = query.all() + db.query(models.Swiped_Users_Archive.swiped_user_fk).filter(
+            models.Swiped_Users_Archive.current_user_fk == current_user_id
+        ).order_by(models.Swiped_Users_Archive.swipe_date.desc()).all()
     
-    already_swiped_ids = [profile[0] for profile in already_swiped]
+    already_swiped_ids = list(dict.fromkeys(profile[0] for profile in already_swiped))
     
     excluded_ids = already_swiped_ids + [current_user_id]
     
-    active_state = db.query(models.Relationship_State).filter(
-        models.Relationship_State.state == "active"
-    ).first()
+    active_state_id = get_state_id(db, "active")
     
-    if active_state:
+    if active_state_id is not None:
         active_matches = db.query(models.Couple_Relationship).filter(
             or_(
                 models.Couple_Relationship.first_user_fk == current_user_id,
                 models.Couple_Relationship.second_user_fk == current_user_id
             ),
-            models.Couple_Relationship.state_fk == active_state.id
+            models.Couple_Relationship.state_fk == active_state_id
         ).all()
         
         for match in active_matches:
@@ -80,9 +203,26 @@ def filter_compatible_profiles(
     profiles = data.get("profiles", [])
     excluded_ids = data.get("excluded_ids", [])
     allow_recycling = data.get("allow_recycling", True)  # Permitir usuarios ya vistos
+    approximate = data.get("approximate", False)  # Ranking aproximado MinHash/LSH para pools enormes (requiere pool_version)
+    seed = data.get("seed", 0)  # Semilla del desempate entre perfiles con igual puntuación
+    use_snapshot = data.get("use_snapshot", False)  # Pool = snapshot mmap de features, no `profiles`
+    # Proyección de la respuesta: "full", "scores" o "ids". El snapshot solo
+    # guarda las features de ranking (no username, edad...), así que con él no
+    # hay perfiles completos que devolver y por defecto se usa "scores".
+    fields = data.get("fields", "scores" if use_snapshot else "full")
+    include_score = data.get("include_score", False)  # Añade "score" a cada perfil en modo "full"
     
     if not current_user:
         raise HTTPException(status_code=400, detail="current_user es requerido")
+    if fields not in RESPONSE_FIELDS:
+        raise HTTPException(status_code=400, detail=f"fields debe ser uno de {list(RESPONSE_FIELDS)}")
+    if not isinstance(seed, int) or isinstance(seed, bool):
+        raise HTTPException(status_code=400, detail="seed debe ser un entero")
+    if use_snapshot and fields == "full":
+        raise HTTPException(
+            status_code=400,
+            detail='use_snapshot no tiene perfiles completos: usa fields="scores" o "ids"',
+        )
     
     user_id = current_user.get("id")
     user_gender = current_user.get("gender")
@@ -91,6 +231,34 @@ def filter_compatible_profiles(
     user_sexual_orientation_id = current_user.get("sexual_orientation_id")
     user_interests = current_user.get("interests", [])
 
+    snapshot = None
+    if use_snapshot:
+        snapshot = feature_snapshot.get_snapshot(
+            settings.FEATURE_SNAPSHOT_PATH, settings.FEATURE_SNAPSHOT_RECHECK_SECONDS
+        )
+        if snapshot is None:
+            raise HTTPException(status_code=503, detail="Snapshot de features no disponible")
+
+    # Solo se cachea si el pool viene versionado (por el llamador o por el
+    # snapshot): hashear aquí el pool completo cuesta más que rankearlo.
+    pool_ver = f"snapshot:{snapshot.version}" if snapshot is not None else data.get("pool_version")
+    cache_key = None
+    if pool_ver is not None:
+        cache_key = (
+            user_id,
+            user_gender_id,
+            user_sexual_orientation_id,
+            frozenset(str(i) for i in user_interests),
+            pool_ver,
+            data.get("excluded_version") or ranking_cache.excluded_version(excluded_ids),
+            bool(allow_recycling),
+            bool(approximate),
+            seed,
+        )
+    cached = _ranking_cache.get(cache_key)
+    if cached is not None:
+        return _ranking_response(*cached, fields=fields, include_score=include_score)
+
     # En el frontend ya se asume este mapeo (ver Ajustes.jsx): 1=hombre, 2=mujer, resto="Otro"
     MALE_ID = 1
     FEMALE_ID = 2
@@ -122,20 +290,12 @@ def filter_compatible_profiles(
 
     target_gender_ids = target_gender_ids_for_user()
 
-    def is_compatible(profile: Dict[str, Any]) -> bool:
-        pid = profile.get("id")
-        if pid is None:
-            return False
-
-        if pid == user_id:
-            return False
-
+    def accepts_gender_id(pgid: Any) -> bool:
         # Filtro fuerte por género objetivo (basado en sexual_orientation_id):
         # - target_gender_ids == {1} => solo hombres
         # - target_gender_ids == {2} => solo mujeres
         # - target_gender_ids == set() => "no binarixs": todo lo que NO sea 1 o 2
         if target_gender_ids is not None:
-            pgid = profile.get("gender_id")
             if not isinstance(pgid, int):
                 return False
 
@@ -148,6 +308,29 @@ def filter_compatible_profiles(
                     return False
 
         return True
+
+    def is_compatible(profile: Dict[str, Any]) -> bool:
+        pid = profile.get("id")
+        if pid is None:
+            return False
+
+        if pid == user_id:
+            return False
+
+        return accepts_gender_id(profile.get("gender_id"))
+
+    excluded_set = set(excluded_ids)
+
+    if snapshot is not None:
+        ranked, is_recycled = _rank_snapshot(
+            snapshot, user_id, user_interests, accepts_gender_id, excluded_set, allow_recycling, seed
+        )
+        logger.info(
+            f"[filter-compatible] user_id={user_id} snapshot={snapshot.version} total={len(snapshot)} "
+            f"ranked={len(ranked)} is_recycled={is_recycled}"
+        )
+        _ranking_cache.put(cache_key, (ranked, is_recycled), weight=len(ranked))
+        return _ranking_response(ranked, is_recycled, fields=fields, include_score=include_score)
     
     all_other_users = [p for p in profiles if p["id"] != user_id]
     
@@ -166,10 +349,11 @@ def filter_compatible_profiles(
 
     # Nunca hacer fallback a perfiles incompatibles por género.
     if not compatible_profiles:
-        return {"profiles": [], "count": 0, "is_recycled": False}
+        _ranking_cache.put(cache_key, ([], False))
+        return _ranking_response([], False, fields=fields, include_score=include_score)
     
-    new_compatible = [p for p in compatible_profiles if p["id"] not in excluded_ids]
-    recycled_compatible = [p for p in compatible_profiles if p["id"] in excluded_ids]
+    new_compatible = [p for p in compatible_profiles if p["id"] not in excluded_set]
+    recycled_compatible = [p for p in compatible_profiles if p["id"] in excluded_set]
     
     if new_compatible:
         profiles_to_rank = new_compatible
@@ -181,17 +365,173 @@ def filter_compatible_profiles(
         profiles_to_rank = []
         is_recycled = False
     
+    # Modo aproximado: solo se re-puntúan de forma exacta los candidatos que
+    # devuelve el índice LSH; el resto va al final sin puntuar.
+    unscored_profiles = []
+    index = None
+    if approximate and len(profiles_to_rank) >= settings.LSH_MIN_POOL_SIZE:
+        index = get_lsh_index(pool_ver, profiles)
+    if index is not None:
+        candidate_ids = index.query(user_interests)
+        unscored_profiles = [p for p in profiles_to_rank if p["id"] not in candidate_ids]
+        profiles_to_rank = [p for p in profiles_to_rank if p["id"] in candidate_ids]
+        logger.info(
+            f"[filter-compatible] approximate candidates={len(profiles_to_rank)} "
+            f"unscored={len(unscored_profiles)}"
+        )
+
     profiles_with_score = []
     for profile in profiles_to_rank:
         profile_interests = profile.get("interests", [])
         similarity_score = jaccard_similarity(user_interests, profile_interests)
-        # Add a small random jitter so profiles with same score don't always keep the same order
-        profiles_with_score.append((profile, similarity_score, random.random()))
+        # Seeded tie-break so profiles with same score don't always keep the same order,
+        # but identical requests still get identical (cacheable) rankings
+        tie = ranking_cache.tie_breaker(seed, user_id, profile["id"])
+        profiles_with_score.append((profile, similarity_score, tie))
     
     profiles_with_score.sort(key=lambda x: (x[1], x[2]), reverse=True)
     
-    ranked_profiles = [profile for profile, score, _ in profiles_with_score]
-    
+    ranked = [(profile, score) for profile, score, _ in profiles_with_score]
+    ranked += [(profile, None) for profile in unscored_profiles]
+
+    _ranking_cache.put(cache_key, (ranked, is_recycled), weight=len(ranked))
+    return _ranking_response(ranked, is_recycled, fields=fields, include_score=include_score)
+
+
+def _build_lsh_index(pool_ver: Any, profiles: List[Dict[str, Any]]) -> None:
+    with _lsh_build_lock:
+        if _lsh_indexes.get(pool_ver) is not None:
+            return
+        try:
+            index = lsh.LSHIndex(num_perm=settings.LSH_NUM_PERM, bands=settings.LSH_BANDS)
+            index.update(profiles)
+            _lsh_indexes.put(pool_ver, index, weight=len(profiles))
+            logger.info(f"[filter-compatible] built LSH index pool_version={pool_ver} profiles={len(index)}")
+        except Exception:
+            logger.exception(f"[filter-compatible] LSH index build failed pool_version={pool_ver}")
+
+
+def _lsh_builder_loop(pool_ver: Any, profiles: List[Dict[str, Any]]) -> None:
+    global _lsh_building, _lsh_pending, _lsh_builder
+    while True:
+        _build_lsh_index(pool_ver, profiles)
+        with _lsh_state_lock:
+            if _lsh_pending is None:
+                _lsh_building = _lsh_builder = None
+                return
+            (pool_ver, profiles), _lsh_pending = _lsh_pending, None
+            _lsh_building = pool_ver
+
+
+def get_lsh_index(pool_ver: Any, profiles: List[Dict[str, Any]], wait: bool = False):
+    """
+    Índice LSH del pool `pool_ver`. Si aún no existe se construye en un hilo
+    aparte y, mientras tanto, devuelve None (ranking exacto): construirlo
+    cuesta varios segundos en pools grandes. Solo hay un constructor: si está
+    ocupado, la versión queda pendiente y sustituye a la que ya lo estuviera
+    (las intermedias ya no se pedirán). Sin versión, o si el pool no cabe en
+    la caché de índices, también devuelve None.
+    """
+    global _lsh_building, _lsh_pending, _lsh_builder
+    if pool_ver is None or len(profiles) > settings.LSH_INDEX_MAX_PROFILES:
+        return None
+    index = _lsh_indexes.get(pool_ver)
+    if index is not None:
+        return index
+    if wait:
+        _build_lsh_index(pool_ver, profiles)
+        return _lsh_indexes.get(pool_ver)
+    with _lsh_state_lock:
+        if pool_ver == _lsh_building or (_lsh_pending is not None and _lsh_pending[0] == pool_ver):
+            return None
+        if _lsh_builder is not None:
+            _lsh_pending = (pool_ver, list(profiles))
+            return None
+        _lsh_building = pool_ver
+        _lsh_builder = threading.Thread(
+            target=_lsh_builder_loop, args=(pool_ver, list(profiles)), name="lsh-index-build", daemon=True
+        )
+        _lsh_builder.start()
+    return None
+
+
+def _rank_snapshot(
+    snapshot: feature_snapshot.FeatureSnapshot,
+    user_id: Any,
+    user_interests: List[Any],
+    accepts_gender_id,
+    excluded_set: set,
+    allow_recycling: bool,
+    seed: int,
+) -> tuple[List[tuple], bool]:
+    """Mismo filtro y ranking que con `profiles`, leyendo del snapshot mmap (Jaccard con bitsets); pares (id, score)"""
+    user_bits, unknown_interests = snapshot.encode_interests(user_interests)
+    user_count = user_bits.bit_count() + unknown_interests
+
+    accepted: Dict[int, bool] = {}
+    new_rows, recycled_rows = [], []
+    for row, (pid, pgid) in enumerate(zip(snapshot.user_ids, snapshot.gender_ids)):
+        if pid == user_id:
+            continue
+        ok = accepted.get(pgid)
+        if ok is None:
+            ok = accepted[pgid] = accepts_gender_id(None if pgid == feature_snapshot.UNKNOWN else pgid)
+        if ok:
+            (recycled_rows if pid in excluded_set else new_rows).append(row)
+
+    if new_rows:
+        rows, is_recycled = new_rows, False
+    elif recycled_rows and allow_recycling:
+        rows, is_recycled = recycled_rows, True
+    else:
+        rows, is_recycled = [], False
+
+    rows_with_score = []
+    for row in rows:
+        bits = snapshot.interest_bits(row)
+        score = 0.0
+        if user_count and bits:
+            intersection = (user_bits & bits).bit_count()
+            score = intersection / (user_count + bits.bit_count() - intersection)
+        rows_with_score.append((row, score, ranking_cache.tie_breaker(seed, user_id, snapshot.user_ids[row])))
+
+    rows_with_score.sort(key=lambda x: (x[1], x[2]), reverse=True)
+    # Solo (id, score): decodificar cada fila a dict copiaría el pool entero en
+    # cada worker (y en la caché), justo lo que el snapshot compartido evita
+    user_ids = snapshot.user_ids
+    return [(user_ids[row], score) for row, score, _ in rows_with_score], is_recycled
+
+
+# Proyecciones de /filter-compatible. El ranking cacheado es el mismo para
+# todas: la proyección solo decide qué se serializa.
+RESPONSE_FIELDS = ("full", "scores", "ids")
+
+
+def _ranked_id(entry: Any) -> Any:
+    # El ranking del snapshot guarda ids; el de `profiles`, los dicts del pool
+    return entry["id"] if isinstance(entry, dict) else entry
+
+
+def _ranking_response(
+    ranked: List[tuple],
+    is_recycled: bool,
+    fields: str = "full",
+    include_score: bool = False,
+) -> Dict[str, Any]:
+    """`ranked` son pares (perfil o id, score); "full" necesita perfiles"""
+    if fields == "ids":
+        return {
+            "ids": [_ranked_id(entry) for entry, _ in ranked],
+            "count": len(ranked),
+            "is_recycled": is_recycled
+        }
+    if fields == "scores":
+        ranked_profiles = [{"id": _ranked_id(entry), "score": score} for entry, score in ranked]
+    elif include_score:
+        # Copias: los dicts del ranking están en la caché y no se tocan
+        ranked_profiles = [{**profile, "score": score} for profile, score in ranked]
+    else:
+        ranked_profiles = [profile for profile, _ in ranked]
     return {
         "profiles": ranked_profiles,
         "count": len(ranked_profiles),
@@ -199,6 +539,22 @@ def filter_compatible_profiles(
     }
 
 
+@router.post("/internal/feature-snapshot")
+def rebuild_feature_snapshot(
+    data: Dict[str, Any] = Body(...)
+):
+    profiles = data.get("profiles", [])
+    try:
+        return feature_snapshot.write_snapshot(settings.FEATURE_SNAPSHOT_PATH, profiles)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.get("/internal/ranking-cache/stats")
+def ranking_cache_stats():
+    return _ranking_cache.stats()
+
+
 @router.post("/swipe", response_model=schemas.SwipeResponse, status_code=status.HTTP_201_CREATED)
 def swipe_user(
     swipe: schemas.SwipeData,
@@ -210,6 +566,20 @@ def swipe_user(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="You cannot swipe on yourself"
         )
+
+    buffer = get_swipe_buffer()
+    if buffer is not None:
+        try:
+            is_match = buffer.record(db, current_user_id, swipe.user_id, swipe.is_like, datetime.today())
+        except LookupError as exc:
+            raise HTTPException(status_code=500, detail=str(exc))
+        _like_graph.apply_swipe(current_user_id, swipe.user_id, swipe.is_like)
+        return schemas.SwipeResponse(
+            sender_user_id=current_user_id,
+            reciever_user_id=swipe.user_id,
+            swiped_at=datetime.today(),
+            is_match=is_match
+        )
     
     existing_swipe = db.query(models.Swiped_Users).filter(
         models.Swiped_Users.current_user_fk == current_user_id,
@@ -217,6 +587,7 @@ def swipe_user(
     ).first()
         
     if existing_swipe:
+        counters.record_swipe(db, current_user_id, swipe.user_id, existing_swipe.is_like, swipe.is_like)
         existing_swipe.is_like = swipe.is_like
         existing_swipe.swipe_date = datetime.today()
         db.commit()
@@ -229,7 +600,10 @@ def swipe_user(
         )
         
         db.add(new_swipe)
+        counters.record_swipe(db, current_user_id, swipe.user_id, None, swipe.is_like)
         db.commit()
+
+    _like_graph.apply_swipe(current_user_id, swipe.user_id, swipe.is_like)
     
     is_match = False
     
@@ -243,11 +617,9 @@ def swipe_user(
         if other_user_swipe:
             is_match = True
             
-            active_state = db.query(models.Relationship_State).filter(
-                models.Relationship_State.state == "active"
-            ).first()
+            active_state_id = get_state_id(db, "active")
             
-            if not active_state:
+            if active_state_id is None:
                 raise HTTPException(
                     status_code=500,
                     detail="Estado 'active' no encontrado en la base de datos"
@@ -256,9 +628,11 @@ def swipe_user(
             new_relationship = models.Couple_Relationship(
                 first_user_fk=current_user_id,
                 second_user_fk=swipe.user_id,
-                state_fk=active_state.id
+                state_fk=active_state_id
             )
             db.add(new_relationship)
+            db.flush()
+            counters.record_match(db, current_user_id, swipe.user_id, new_relationship.id)
             db.commit()
     
     response = schemas.SwipeResponse(
@@ -313,11 +687,9 @@ def get_active_relationship(
     db: Session = Depends(get_db)
 ):
 
-    active_state = db.query(models.Relationship_State).filter(
-        models.Relationship_State.state == "active"
-    ).first()
+    active_state_id = get_state_id(db, "active")
     
-    if not active_state:
+    if active_state_id is None:
         return schemas.ActiveRelationshipResponse(has_active_match=False)
     
     relationship = db.query(models.Couple_Relationship).filter(
@@ -325,7 +697,7 @@ def get_active_relationship(
             models.Couple_Relationship.first_user_fk == user_id,
             models.Couple_Relationship.second_user_fk == user_id
         ),
-        models.Couple_Relationship.state_fk == active_state.id
+        models.Couple_Relationship.state_fk == active_state_id
     ).first()
     
     if not relationship:
@@ -364,32 +736,48 @@ def dismatch_relationship(
     if current_user_id not in (relationship.first_user_fk, relationship.second_user_fk):
         raise HTTPException(status_code=403, detail="You are not part of this relationship")
 
-    inactive_state = db.query(models.Relationship_State).filter(
-        models.Relationship_State.state == "inactive"
-    ).first()
-    if not inactive_state:
+    inactive_state_id = get_state_id(db, "inactive")
+    if inactive_state_id is None:
         raise HTTPException(status_code=500, detail="Estado 'inactive' no encontrado en la base de datos")
 
-    relationship.state_fk = inactive_state.id
+    relationship.state_fk = inactive_state_id
 
     user_a = relationship.first_user_fk
     user_b = relationship.second_user_fk
 
-    db.query(models.Swiped_Users).filter(
+    counters.record_dismatch(db, user_a, user_b, relationship.id)
+    for sender, receiver in db.query(models.Swiped_Users.current_user_fk, models.Swiped_Users.swiped_user_fk).filter(
         or_(
-            and_(
-                models.Swiped_Users.current_user_fk == user_a,
-                models.Swiped_Users.swiped_user_fk == user_b,
-            ),
-            and_(
-                models.Swiped_Users.current_user_fk == user_b,
-                models.Swiped_Users.swiped_user_fk == user_a,
-            ),
-        )
-    ).delete(synchronize_session=False)
+            and_(models.Swiped_Users.current_user_fk == user_a, models.Swiped_Users.swiped_user_fk == user_b),
+            and_(models.Swiped_Users.current_user_fk == user_b, models.Swiped_Users.swiped_user_fk == user_a),
+        ),
+        models.Swiped_Users.is_like == True
+    ):
+        counters.record_swipe(db, sender, receiver, True, None)
+
+    buffer = get_swipe_buffer()
+    if buffer is not None:
+        buffer.forget_pair(user_a, user_b)
+
+    for table in (models.Swiped_Users, models.Swiped_Users_Archive):
+        db.query(table).filter(
+            or_(
+                and_(
+                    table.current_user_fk == user_a,
+                    table.swiped_user_fk == user_b,
+                ),
+                and_(
+                    table.current_user_fk == user_b,
+                    table.swiped_user_fk == user_a,
+                ),
+            )
+        ).delete(synchronize_session=False)
 
     db.commit()
 
+    _like_graph.remove_like(user_a, user_b)
+    _like_graph.remove_like(user_b, user_a)
+
     return {
         "success": True,
         "relationship_id": relationship.id,
@@ -424,18 +812,85 @@ def get_connections_history(
     return {"partners": partners, "count": len(partners)}
 
 
+@router.get("/likes/received/{user_id}")
+def get_likes_received(
+    user_id: int,
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    user_ids, total = get_like_graph(db).likes_received(user_id, skip=skip, limit=limit)
+    return {"user_ids": user_ids, "count": total, "skip": skip, "limit": limit}
+
+
+@router.get("/likes/mutual/{user_id}")
+def get_mutual_likes_count(
+    user_id: int,
+    db: Session = Depends(get_db),
+):
+    return {"user_id": user_id, "mutual_count": get_like_graph(db).mutual_count(user_id)}
+
+
+@router.post("/internal/swipes/archive")
+def archive_swipes(
+    older_than_days: int | None = Query(default=None, ge=1, description="Por defecto SWIPE_RETENTION_DAYS"),
+    db: Session = Depends(get_db),
+):
+    cutoff = swipe_retention.retention_cutoff(older_than_days or settings.SWIPE_RETENTION_DAYS)
+    result = swipe_retention.archive_old_swipes(db, cutoff, batch_size=settings.SWIPE_ARCHIVE_BATCH_SIZE)
+    for sender, receiver in result["archived_likes"]:
+        _like_graph.remove_like(sender, receiver)
+    return {
+        "success": True,
+        "cutoff": cutoff,
+        "moved": result["moved"],
+        "batches": result["batches"],
+    }
+
+
+@router.get("/stats")
+def get_user_stats(
+    user_ids: List[int] = Query(..., description="IDs de usuario (se puede repetir)"),
+    db: Session = Depends(get_db),
+):
+    if len(user_ids) > settings.STATS_MAX_USERS:
+        raise HTTPException(status_code=400, detail=f"Máximo {settings.STATS_MAX_USERS} usuarios por petición")
+    stats = counters.get_counters(db, user_ids)
+    return {"users": list(stats.values()), "count": len(stats)}
+
+
+@router.post("/internal/counters/reconcile")
+def reconcile_user_counters(
+    batch_size: int = Query(default=1000, ge=1, le=10000),
+    dry_run: bool = Query(default=False, description="Solo informar de la deriva, sin corregir"),
+    db: Session = Depends(get_db),
+):
+    report = counters.reconcile_counters(db, batch_size=batch_size, dry_run=dry_run)
+    if report["users_drifted"]:
+        logger.warning(f"[counters] drift found: {report['users_drifted']} users {report['drift']}")
+    return report
+
+
 @router.delete("/internal/users/delete")
 def delete_user_data_internal(
     user_id: int = Query(...),
     db: Session = Depends(get_db),
 ):
 
-    swipes_deleted = db.query(models.Swiped_Users).filter(
-        or_(
-            models.Swiped_Users.current_user_fk == user_id,
-            models.Swiped_Users.swiped_user_fk == user_id,
-        )
-    ).delete(synchronize_session=False)
+    buffer = get_swipe_buffer()
+    if buffer is not None:
+        buffer.forget_user(user_id)
+
+    counters.record_user_deleted(db, user_id)
+
+    swipes_deleted = 0
+    for table in (models.Swiped_Users, models.Swiped_Users_Archive):
+        swipes_deleted += db.query(table).filter(
+            or_(
+                table.current_user_fk == user_id,
+                table.swiped_user_fk == user_id,
+            )
+        ).delete(synchronize_session=False)
 
     relationships_deleted = db.query(models.Couple_Relationship).filter(
         or_(
@@ -445,6 +900,7 @@ def delete_user_data_internal(
     ).delete(synchronize_session=False)
 
     db.commit()
+    _like_graph.remove_user(user_id)
     return {
         "success": True,
         "user_id": user_id,
@@ -0,0 +1,432 @@
+"""
+Buffer write-behind para `/matching/swipe`.
+
+Cada swipe se añade a un log local (JSON lines, con fsync opcional) y a un índice
+en memoria, de modo que el match recíproco se detecta al momento. Un hilo vuelca
+los swipes pendientes a `Swiped_Users` / `Couple_Relationship` en un único commit
+cuando se alcanza `max_batch` o pasa `flush_interval` segundos.
+
+Con varios workers de uvicorn cada proceso tiene su propio log
+(`<log>.<worker>`), protegido por un `flock` sobre `<log>.<worker>.lock` que se
+mantiene mientras el proceso vive. Al volcar, el log activo se renombra a
+`.flushing` y se abre uno nuevo; el `.flushing` se borra tras el commit. Al
+arrancar, `start()` reproduce sus propios ficheros y adopta los de cualquier
+worker muerto (aquellos cuyo lock puede tomar), primero `.flushing` y luego el
+log activo, y vuelve a volcar. El volcado es idempotente: los swipes se hacen
+upsert y no se duplican relaciones.
+
+Cada worker solo ve en memoria sus propios swipes, así que el match se vuelve a
+buscar en la BD al volcar, dentro de la transacción del volcado (serializada
+entre procesos con un advisory lock en PostgreSQL): un like recíproco que llegó
+por otro worker crea la relación aunque la respuesta del swipe dijera
+`is_match=False`.
+"""
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, or_, text, tuple_
+from sqlalchemy.orm import Session
+
+import counters
+import models
+
+logger = logging.getLogger("uvicorn.error")
+
+Pair = Tuple[int, int]
+
+# Límite de pares por cláusula IN al cargar los swipes existentes
+_IN_CHUNK = 500
+
+# Clave del advisory lock que serializa los volcados de todos los workers
+_FLUSH_LOCK_KEY = 0x53574950
+
+
+def _worker_paths(base_path: str, worker_id: Optional[str]) -> Tuple[str, str, str]:
+    """(log, .flushing, .lock) de un worker; None = log de antes de separar por worker"""
+    log_path = base_path if worker_id is None else f"{base_path}.{worker_id}"
+    return log_path, log_path + ".flushing", log_path + ".lock"
+
+
+def _worker_ids(base_path: str) -> Set[Optional[str]]:
+    """Workers con algún fichero junto a `base_path`"""
+    directory = os.path.dirname(base_path) or "."
+    pattern = re.compile(re.escape(os.path.basename(base_path)) + r"(?:\.([^.]+))?(?:\.flushing|\.lock)?$")
+    ids: Set[Optional[str]] = set()
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match:
+            worker_id = match.group(1)
+            ids.add(None if worker_id in (None, "flushing", "lock") else worker_id)
+    return ids
+
+
+def _try_lock(path: str):
+    handle = open(path, "a")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+class SwipeBuffer:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        log_path: str,
+        max_batch: int = 500,
+        flush_interval: float = 0.2,
+        fsync: bool = True,
+        worker_id: Optional[str] = None,
+    ):
+        self.session_factory = session_factory
+        self.base_path = log_path
+        self.worker_id = str(worker_id) if worker_id is not None else str(os.getpid())
+        self.log_path, self.flushing_path, self.lock_path = _worker_paths(log_path, self.worker_id)
+        self._lock_file = None
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        # (sender, receiver) -> (is_like, swipe_date), el último swipe gana
+        self._pending: Dict[Pair, Tuple[bool, datetime]] = {}
+        self._pending_matches: List[Pair] = []
+        # Lote que se está volcando (visible para el sondeo recíproco hasta el commit)
+        self._inflight: Dict[Pair, Tuple[bool, datetime]] = {}
+        self._inflight_matches: List[Pair] = []
+
+        self._active_state_id: Optional[int] = None
+        self._log = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.flushes = 0
+        self.flushed_swipes = 0
+
+    # ------------------------------------------------------------------ ciclo de vida
+
+    def start(self) -> None:
+        self._lock_file = _try_lock(self.lock_path)
+        if self._lock_file is None:
+            raise RuntimeError(f"{self.lock_path} está en uso por otro proceso")
+        replayed = self._replay()
+        self._log = open(self.log_path, "a", encoding="utf-8")
+        if replayed:
+            logger.info(f"[swipe-buffer] replayed {replayed} log records")
+            self.flush()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="swipe-buffer-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            if not self._pending and not self._inflight:
+                # Todo volcado: no dejamos ficheros que otro worker tenga que adoptar
+                for path in (self.log_path, self.flushing_path, self.lock_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._stopping and len(self._pending) < self.max_batch:
+                    self._wakeup.wait(self.flush_interval)
+                if self._stopping:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("[swipe-buffer] flush failed, will retry")
+
+    # ------------------------------------------------------------------ log
+
+    def _append(self, record: dict) -> None:
+        self._log.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+
+    def _apply(self, record: dict) -> None:
+        if "forget_user" in record:
+            self._forget_user_locked(record["forget_user"])
+        elif "forget" in record:
+            self._forget_pair_locked(*record["forget"])
+        else:
+            pair = (record["s"], record["r"])
+            self._pending[pair] = (record["l"], datetime.fromisoformat(record["d"]))
+            if record.get("m"):
+                self._pending_matches.append(pair)
+
+    def _replay(self) -> int:
+        """Reproduce los ficheros propios y los de workers muertos; devuelve nº de registros"""
+        count = 0
+        adopted = []  # (ficheros, handle del lock) de otros workers
+        sources = [self.flushing_path, self.log_path]
+        for worker_id in _worker_ids(self.base_path):
+            if worker_id == self.worker_id:
+                continue
+            log_path, flushing_path, lock_path = _worker_paths(self.base_path, worker_id)
+            handle = _try_lock(lock_path)
+            if handle is None:
+                continue  # worker vivo: sus swipes son suyos
+            adopted.append(((flushing_path, log_path, lock_path), handle))
+            sources += [flushing_path, log_path]
+
+        with self._lock:
+            for path in sources:
+                if not os.path.exists(path):
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # Última línea truncada por el crash
+                            logger.warning(f"[swipe-buffer] skipping corrupt log line in {path}")
+                            continue
+                        self._apply(record)
+                        count += 1
+            if count:
+                # Todo lo reproducido queda en memoria: lo reescribimos en un único log
+                with open(self.log_path + ".tmp", "w", encoding="utf-8") as f:
+                    for (s, r), (is_like, date) in self._pending.items():
+                        record = {"s": s, "r": r, "l": is_like, "d": date.isoformat(),
+                                  "m": (s, r) in self._pending_matches}
+                        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(self.log_path + ".tmp", self.log_path)
+                if os.path.exists(self.flushing_path):
+                    os.remove(self.flushing_path)
+            # Ya copiados (con fsync) en nuestro log: se borran los del worker muerto
+            for paths, handle in adopted:
+                for path in paths:
+                    if os.path.exists(path):
+                        os.remove(path)
+                handle.close()
+        return count
+
+    # ------------------------------------------------------------------ API
+
+    def _known_like(self, sender: int, receiver: int) -> Optional[bool]:
+        for source in (self._pending, self._inflight):
+            entry = source.get((sender, receiver))
+            if entry is not None:
+                return entry[0]
+        return None
+
+    def _resolve_active_state(self, db: Session) -> int:
+        if self._active_state_id is None:
+            active_state = db.query(models.Relationship_State).filter(
+                models.Relationship_State.state == "active"
+            ).first()
+            if not active_state:
+                raise LookupError("Estado 'active' no encontrado en la base de datos")
+            self._active_state_id = active_state.id
+        return self._active_state_id
+
+    def record(self, db: Session, sender: int, receiver: int, is_like: bool, swipe_date: datetime) -> bool:
+        """Registra un swipe y devuelve si produce match"""
+        is_match = False
+        if is_like:
+            with self._lock:
+                reciprocal = self._known_like(receiver, sender)
+            if reciprocal is None:
+                reciprocal = db.query(models.Swiped_Users).filter(
+                    models.Swiped_Users.current_user_fk == receiver,
+                    models.Swiped_Users.swiped_user_fk == sender,
+                    models.Swiped_Users.is_like == True
+                ).first() is not None
+            if reciprocal:
+                self._resolve_active_state(db)
+                is_match = True
+
+        with self._lock:
+            if is_like and not is_match and self._known_like(receiver, sender):
+                # El like recíproco llegó mientras consultábamos la BD: sin esta
+                # segunda comprobación ambos lados se perderían el match
+                self._resolve_active_state(db)
+                is_match = True
+            self._append({"s": sender, "r": receiver, "l": is_like, "d": swipe_date.isoformat(), "m": is_match})
+            self._pending[(sender, receiver)] = (is_like, swipe_date)
+            if is_match:
+                self._pending_matches.append((sender, receiver))
+            if len(self._pending) >= self.max_batch:
+                self._wakeup.notify()
+        return is_match
+
+    def _forget_pair_locked(self, user_a: int, user_b: int) -> None:
+        for pair in ((user_a, user_b), (user_b, user_a)):
+            self._pending.pop(pair, None)
+        self._pending_matches = [
+            m for m in self._pending_matches if set(m) != {user_a, user_b}
+        ]
+
+    def _forget_user_locked(self, user_id: int) -> None:
+        self._pending = {p: v for p, v in self._pending.items() if user_id not in p}
+        self._pending_matches = [m for m in self._pending_matches if user_id not in m]
+
+    def forget_pair(self, user_a: int, user_b: int) -> None:
+        """
+        Descarta los swipes pendientes entre dos usuarios (dismatch). Espera a
+        que termine cualquier volcado en curso para que el DELETE posterior del
+        llamador vea todo lo ya escrito.
+        """
+        with self._flush_lock, self._lock:
+            self._forget_pair_locked(user_a, user_b)
+            if self._log is not None:
+                self._append({"forget": [user_a, user_b]})
+
+    def forget_user(self, user_id: int) -> None:
+        with self._flush_lock, self._lock:
+            self._forget_user_locked(user_id)
+            if self._log is not None:
+                self._append({"forget_user": user_id})
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    # ------------------------------------------------------------------ volcado
+
+    def flush(self) -> int:
+        """Vuelca los swipes pendientes en un único commit; devuelve cuántos escribió"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._inflight:
+                    # Si el volcado anterior falló, `_inflight` y `.flushing`
+                    # siguen ahí y se reintentan antes de rotar de nuevo.
+                    if not self._pending:
+                        return 0
+                    self._inflight, self._pending = self._pending, {}
+                    self._inflight_matches, self._pending_matches = self._pending_matches, []
+                    if self._log is not None:
+                        self._log.close()
+                        os.replace(self.log_path, self.flushing_path)
+                        self._log = open(self.log_path, "a", encoding="utf-8")
+                batch = dict(self._inflight)
+                matches = list(self._inflight_matches)
+
+            db = self.session_factory()
+            try:
+                if db.get_bind().dialect.name == "postgresql":
+                    # Un volcado a la vez entre workers: cada uno ve ya confirmados
+                    # los likes recíprocos que volcaron los demás
+                    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _FLUSH_LOCK_KEY})
+                self._write_batch(db, batch, matches)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+            with self._lock:
+                self._inflight = {}
+                self._inflight_matches = []
+                if os.path.exists(self.flushing_path):
+                    os.remove(self.flushing_path)
+                self.flushes += 1
+                self.flushed_swipes += len(batch)
+            return len(batch)
+
+    @staticmethod
+    def _reciprocal_likes(db: Session, batch: Dict[Pair, Tuple[bool, datetime]]) -> List[Pair]:
+        """Likes del lote cuyo recíproco ya está en la BD (p. ej. volcado por otro worker)"""
+        reversed_pairs = [(r, s) for (s, r), (is_like, _) in batch.items() if is_like]
+        found = []
+        for i in range(0, len(reversed_pairs), _IN_CHUNK):
+            chunk = reversed_pairs[i:i + _IN_CHUNK]
+            rows = db.query(models.Swiped_Users.current_user_fk, models.Swiped_Users.swiped_user_fk).filter(
+                tuple_(models.Swiped_Users.current_user_fk, models.Swiped_Users.swiped_user_fk).in_(chunk),
+                models.Swiped_Users.is_like == True
+            ).all()
+            found += [(r, s) for s, r in rows]
+        return found
+
+    def _write_batch(self, db: Session, batch: Dict[Pair, Tuple[bool, datetime]], matches: List[Pair]) -> None:
+        keys = list(batch)
+        existing: Dict[Pair, models.Swiped_Users] = {}
+        for i in range(0, len(keys), _IN_CHUNK):
+            chunk = keys[i:i + _IN_CHUNK]
+            rows = db.query(models.Swiped_Users).filter(
+                tuple_(models.Swiped_Users.current_user_fk, models.Swiped_Users.swiped_user_fk).in_(chunk)
+            ).all()
+            existing.update({(r.current_user_fk, r.swiped_user_fk): r for r in rows})
+
+        for pair, (is_like, swipe_date) in batch.items():
+            row = existing.get(pair)
+            counters.record_swipe(db, pair[0], pair[1], row.is_like if row is not None else None, is_like)
+            if row is not None:
+                row.is_like = is_like
+                row.swipe_date = swipe_date
+            else:
+                db.add(models.Swiped_Users(
+                    current_user_fk=pair[0],
+                    swiped_user_fk=pair[1],
+                    is_like=is_like,
+                    swipe_date=swipe_date
+                ))
+        db.flush()
+        matches = matches + self._reciprocal_likes(db, batch)
+
+        if not matches:
+            return
+        active_state_id = self._resolve_active_state(db)
+        created = set()
+        for user_a, user_b in matches:
+            key = frozenset((user_a, user_b))
+            if key in created:
+                continue
+            created.add(key)
+            relationships = db.query(models.Couple_Relationship).filter(
+                or_(
+                    and_(models.Couple_Relationship.first_user_fk == user_a,
+                         models.Couple_Relationship.second_user_fk == user_b),
+                    and_(models.Couple_Relationship.first_user_fk == user_b,
+                         models.Couple_Relationship.second_user_fk == user_a),
+                )
+            ).all()
+            if any(rel.state_fk == active_state_id for rel in relationships):
+                continue
+            # Un fallo de la restricción unique_match tumbaría el lote entero:
+            # si ya hubo una relación (a, b) se reactiva en lugar de insertar otra.
+            same_order = next((rel for rel in relationships if rel.first_user_fk == user_a), None)
+            if same_order is not None:
+                same_order.state_fk = active_state_id
+                counters.record_match(db, user_a, user_b, same_order.id, new_row=False)
+            else:
+                relationship = models.Couple_Relationship(
+                    first_user_fk=user_a,
+                    second_user_fk=user_b,
+                    state_fk=active_state_id
+                )
+                db.add(relationship)
+                db.flush()
+                counters.record_match(db, user_a, user_b, relationship.id)
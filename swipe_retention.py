@@ -0,0 +1,75 @@
+"""
+Retención del historial de swipes.
+
+`Swiped_Users` es la partición caliente: solo guarda swipes de los últimos
+SWIPE_RETENTION_DAYS y es la única que tocan los caminos calientes (sondeo
+recíproco de /swipe, excluded-users con `only_recent`, grafo de likes). Los
+swipes más antiguos se mueven por lotes a `Swiped_Users_Archive`, que solo se
+consulta para el historial completo y para borrar datos de usuario.
+
+Un like archivado ya no genera match, ni aparece en "likes recibidos", ni
+cuenta en los contadores de likes (counters.py).
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+import counters
+import models
+
+
+def retention_cutoff(retention_days: int, now: datetime | None = None) -> datetime:
+    return (now or datetime.today()) - timedelta(days=retention_days)
+
+
+def archive_old_swipes(db: Session, cutoff: datetime, batch_size: int = 5000) -> Dict[str, object]:
+    """
+    Mueve a la partición fría los swipes anteriores a `cutoff`, un commit por
+    lote para no bloquear la tabla caliente. Devuelve cuántos movió y los likes
+    archivados (para quitarlos del grafo en memoria).
+    """
+    moved = 0
+    batches = 0
+    archived_likes: List[Tuple[int, int]] = []
+    while True:
+        rows = db.query(models.Swiped_Users).filter(
+            models.Swiped_Users.swipe_date < cutoff
+        ).limit(batch_size).all()
+        if not rows:
+            break
+
+        keys = [(r.current_user_fk, r.swiped_user_fk) for r in rows]
+        existing = {
+            (a.current_user_fk, a.swiped_user_fk): a
+            for a in db.query(models.Swiped_Users_Archive).filter(
+                tuple_(models.Swiped_Users_Archive.current_user_fk,
+                       models.Swiped_Users_Archive.swiped_user_fk).in_(keys)
+            )
+        }
+        for row in rows:
+            key = (row.current_user_fk, row.swiped_user_fk)
+            archived = existing.get(key)
+            if archived is None:
+                db.add(models.Swiped_Users_Archive(
+                    current_user_fk=row.current_user_fk,
+                    swiped_user_fk=row.swiped_user_fk,
+                    is_like=row.is_like,
+                    swipe_date=row.swipe_date
+                ))
+            elif archived.swipe_date <= row.swipe_date:
+                archived.is_like = row.is_like
+                archived.swipe_date = row.swipe_date
+            if row.is_like:
+                archived_likes.append(key)
+                counters.record_swipe(db, row.current_user_fk, row.swiped_user_fk, True, None)
+            db.delete(row)
+        db.commit()
+
+        moved += len(rows)
+        batches += 1
+        if len(rows) < batch_size:
+            break
+
+    return {"moved": moved, "batches": batches, "archived_likes": archived_likes}
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+import admission
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_requests_over_the_limit_wait_and_inherit_the_released_slot():
+    async def scenario():
+        cls = admission.AdmissionClass("write", max_concurrency=1, max_queue=1, queue_timeout=1.0)
+        await cls.acquire()
+        waiting = asyncio.create_task(cls.acquire())
+        await asyncio.sleep(0)
+        assert cls.queued == 1
+
+        cls.release()
+        await waiting
+        assert cls.active == 1
+        assert cls.queued == 0
+        cls.release()
+        assert cls.active == 0
+        return cls.stats()
+
+    stats = run(scenario())
+    assert stats["admitted"] == 2
+    assert stats["shed_queue_full"] == stats["shed_deadline"] == 0
+
+
+def test_full_queue_is_shed_immediately():
+    async def scenario():
+        cls = admission.AdmissionClass("ranking", max_concurrency=1, max_queue=0, queue_timeout=1.0)
+        await cls.acquire()
+        with pytest.raises(admission.Overloaded) as exc:
+            await cls.acquire()
+        return exc.value.reason, cls.stats()
+
+    reason, stats = run(scenario())
+    assert reason == "queue_full"
+    assert stats["shed_queue_full"] == 1
+
+
+def test_missed_deadline_is_shed_and_does_not_leak_slots():
+    async def scenario():
+        cls = admission.AdmissionClass("read", max_concurrency=1, max_queue=5, queue_timeout=0.01)
+        await cls.acquire()
+        with pytest.raises(admission.Overloaded) as exc:
+            await cls.acquire()
+        cls.release()
+        return exc.value.reason, cls.stats()
+
+    reason, stats = run(scenario())
+    assert reason == "deadline"
+    assert stats["shed_deadline"] == 1
+    assert stats["active"] == 0
+    assert stats["queued"] == 0
+
+
+def test_classification_keeps_health_checks_out_of_admission():
+    classify = admission.classify_matching_request
+
+    assert classify("GET", "/health") is None
+    assert classify("GET", "/ready") is None
+    assert classify("GET", "/matching/internal/ranking-cache/stats") is None
+    assert classify("POST", "/matching/filter-compatible") == "ranking"
+    assert classify("POST", "/matching/swipe") == "write"
+    assert classify("POST", "/matching/relationships/7/dismatch") == "write"
+    assert classify("GET", "/matching/excluded-users/1") == "read"
+    assert classify("POST", "/matching/internal/counters/reconcile") == "batch"
+    assert classify("POST", "/matching/internal/swipes/archive") == "batch"
@@ -0,0 +1,103 @@
+import gzip
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import compression
+
+BIG = {"profiles": [{"id": i, "interests": ["music", "travel"]} for i in range(200)]}
+
+
+@pytest.fixture
+def client():
+    async def big(request):
+        return JSONResponse(BIG)
+
+    async def small(request):
+        return JSONResponse({"ok": True})
+
+    async def stream(request):
+        return StreamingResponse(iter([b"a" * 2000, b"b" * 2000]), media_type="text/plain")
+
+    async def png(request):
+        return PlainTextResponse(b"x" * 2000, media_type="image/png")
+
+    app = Starlette(routes=[Route(f"/{f.__name__}", f) for f in (big, small, stream, png)])
+    return TestClient(compression.CompressionMiddleware(app, minimum_size=1024))
+
+
+def test_negotiation_respects_q_values_and_availability():
+    assert compression.negotiate(None) is None
+    assert compression.negotiate("br") is None
+    assert compression.negotiate("gzip;q=0, br") is None
+    assert compression.negotiate("*") == compression.available_encodings()[0]
+    assert compression.negotiate("gzip, deflate") == "gzip"
+    expected = "zstd" if compression.zstandard is not None else "gzip"
+    assert compression.negotiate("gzip;q=0.5, zstd") == expected
+
+
+def test_large_json_is_gzipped(client):
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(response.content)  # httpx ya descomprimió
+    assert response.json() == BIG
+
+
+def test_small_streaming_and_binary_responses_pass_through(client):
+    for path in ("/small", "/stream", "/png"):
+        response = client.get(path, headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers, path
+
+    response = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.json() == BIG
+
+
+def test_every_response_varies_on_accept_encoding(client):
+    for headers in ({"Accept-Encoding": "gzip"}, {"Accept-Encoding": "identity"}, {}):
+        for path in ("/big", "/small", "/stream", "/png"):
+            response = client.get(path, headers=headers)
+            assert response.headers["vary"] == "Accept-Encoding", (path, headers)
+
+
+def test_vary_is_merged_with_the_existing_header():
+    assert compression._with_vary([(b"vary", b"Origin")]) == [(b"vary", b"Origin, Accept-Encoding")]
+    assert compression._with_vary([(b"Vary", b"accept-encoding")]) == [(b"Vary", b"accept-encoding")]
+
+
+def test_large_bodies_are_compressed_off_the_event_loop(client, monkeypatch):
+    offloaded = []
+    run_sync = compression.anyio.to_thread.run_sync
+
+    async def recording_run_sync(fn, *args, **kwargs):
+        offloaded.append(fn)
+        return await run_sync(fn, *args, **kwargs)
+
+    monkeypatch.setattr(compression.anyio.to_thread, "run_sync", recording_run_sync)
+    client.app.thread_threshold = 1024 * 1024
+    client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert offloaded == []
+
+    client.app.thread_threshold = 1024
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.json() == BIG
+    assert len(offloaded) == 1
+
+
+@pytest.mark.skipif(compression.zstandard is None, reason="zstandard no instalado")
+def test_zstd_round_trip():
+    body = b'{"ids": [1, 2, 3]}' * 100
+    compressed = compression.compress(body, "zstd")
+    assert compression.zstandard.ZstdDecompressor().decompress(compressed) == body
+
+
+def test_gzip_output_is_deterministic():
+    body = b"x" * 5000
+    assert compression.compress(body, "gzip") == compression.compress(body, "gzip")
+    assert gzip.decompress(compression.compress(body, "gzip")) == body
+    with pytest.raises(ValueError):
+        compression.compress(body, "br")
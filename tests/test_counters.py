@@ -0,0 +1,145 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from db import Base
+import counters
+import models
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'matching.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    for state in ("active", "inactive"):
+        session.add(models.Relationship_State(state=state))
+    session.commit()
+    yield session
+    session.close()
+
+
+def like(db, sender, receiver, is_like=True, old=None):
+    db.add(models.Swiped_Users(current_user_fk=sender, swiped_user_fk=receiver, is_like=is_like, swipe_date=datetime(2024, 1, 1)))
+    counters.record_swipe(db, sender, receiver, old, is_like)
+    db.commit()
+
+
+def match(db, a, b):
+    active = db.query(models.Relationship_State).filter(models.Relationship_State.state == "active").one()
+    relationship = models.Couple_Relationship(first_user_fk=a, second_user_fk=b, state_fk=active.id)
+    db.add(relationship)
+    db.flush()
+    counters.record_match(db, a, b, relationship.id)
+    db.commit()
+    return relationship
+
+
+def test_swipes_and_matches_update_counters(db):
+    like(db, 1, 2)
+    like(db, 1, 3, is_like=False)
+    like(db, 2, 1)
+    relationship = match(db, 1, 2)
+
+    stats = counters.get_counters(db, [1, 2, 3, 99])
+    assert stats[1]["likes_sent"] == 1
+    assert stats[1]["likes_received"] == 1
+    assert stats[1]["matches"] == 1
+    assert stats[1]["match_rate"] == 1.0
+    assert stats[2]["active_relationship_id"] == relationship.id
+    assert stats[3]["likes_received"] == 0
+    assert stats[99] == {
+        "user_id": 99, "likes_sent": 0, "likes_sent_total": 0, "likes_received": 0, "matches": 0,
+        "match_rate": 0.0, "has_active_relationship": False, "active_relationship_id": None,
+    }
+
+
+def test_changing_a_like_to_a_dislike_decrements(db):
+    like(db, 1, 2)
+    counters.record_swipe(db, 1, 2, True, False)
+    db.commit()
+    assert counters.get_counters(db, [1])[1]["likes_sent"] == 0
+    assert counters.get_counters(db, [2])[2]["likes_received"] == 0
+
+
+def test_dismatch_clears_only_the_active_relationship(db):
+    relationship = match(db, 1, 2)
+    counters.record_dismatch(db, 1, 2, relationship.id)
+    db.commit()
+    stats = counters.get_counters(db, [1, 2])
+    assert not stats[1]["has_active_relationship"]
+    assert stats[2]["matches"] == 1
+
+
+def test_match_rate_is_stable_across_a_dismatch(db):
+    like(db, 1, 2)
+    like(db, 1, 3)
+    like(db, 2, 1)
+    relationship = match(db, 1, 2)
+    assert counters.get_counters(db, [1])[1]["match_rate"] == 0.5
+
+    # Como el endpoint de dismatch: se borran los likes de la pareja
+    counters.record_dismatch(db, 1, 2, relationship.id)
+    for sender, receiver in ((1, 2), (2, 1)):
+        db.query(models.Swiped_Users).filter(
+            models.Swiped_Users.current_user_fk == sender, models.Swiped_Users.swiped_user_fk == receiver
+        ).delete()
+        counters.record_swipe(db, sender, receiver, True, None)
+    db.commit()
+
+    stats = counters.get_counters(db, [1, 2])
+    assert stats[1]["likes_sent"] == 1
+    assert stats[1]["likes_sent_total"] == 2
+    assert stats[1]["matches"] == 1
+    assert stats[1]["match_rate"] == 0.5
+    assert stats[2]["match_rate"] == 1.0
+
+    # La reconciliación no rebaja el total
+    counters.reconcile_counters(db)
+    assert counters.get_counters(db, [1])[1]["match_rate"] == 0.5
+
+
+def test_user_deletion_adjusts_counterparts(db):
+    like(db, 1, 2)
+    like(db, 3, 1)
+    match(db, 1, 3)
+
+    counters.record_user_deleted(db, 1)
+    db.commit()
+
+    stats = counters.get_counters(db, [1, 2, 3])
+    assert stats[2]["likes_received"] == 0
+    assert stats[3]["likes_sent"] == 0
+    assert stats[3]["matches"] == 0
+    assert not stats[3]["has_active_relationship"]
+    assert db.query(models.User_Match_Counters).filter(models.User_Match_Counters.user_fk == 1).count() == 0
+
+
+def test_reconcile_reports_and_fixes_drift(db):
+    like(db, 1, 2)
+    like(db, 2, 1)
+    relationship = match(db, 1, 2)
+    # Swipe escrito sin pasar por los contadores
+    db.add(models.Swiped_Users(current_user_fk=3, swiped_user_fk=1, is_like=True, swipe_date=datetime(2024, 1, 1)))
+    db.query(models.User_Match_Counters).filter(models.User_Match_Counters.user_fk == 2).update(
+        {models.User_Match_Counters.matches: 5}
+    )
+    db.commit()
+
+    report = counters.reconcile_counters(db, batch_size=1, dry_run=True)
+    assert report["users_checked"] == 3
+    assert report["users_drifted"] == 3
+    assert report["drift"]["matches"] == 4
+    assert counters.get_counters(db, [2])[2]["matches"] == 5
+
+    report = counters.reconcile_counters(db, batch_size=2)
+    assert report["users_drifted"] == 3
+    stats = counters.get_counters(db, [1, 2, 3])
+    assert stats[1]["likes_received"] == 2
+    assert stats[2]["matches"] == 1
+    assert stats[3]["likes_sent"] == 1
+    assert stats[1]["active_relationship_id"] == relationship.id
+
+    assert counters.reconcile_counters(db)["users_drifted"] == 0
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+import feature_snapshot
+
+
+PROFILES = [
+    {"id": 30, "gender_id": 2, "sexual_orientation_id": 0, "interests": ["music", "books"]},
+    {"id": 10, "gender_id": 1, "sexual_orientation_id": 1, "interests": ["music"]},
+    {"id": 20, "gender_id": None, "sexual_orientation_id": 2, "interests": []},
+]
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "features.bin")
+    summary = feature_snapshot.write_snapshot(path, PROFILES)
+    snapshot = feature_snapshot.FeatureSnapshot(path)
+
+    assert summary["users"] == 3
+    assert list(snapshot.user_ids) == [10, 20, 30]
+    assert snapshot.index_of(20) == 1
+    assert snapshot.index_of(99) is None
+    assert snapshot.profile(1) == {"id": 20, "gender_id": None, "sexual_orientation_id": 2, "interests": []}
+    assert sorted(snapshot.interests(snapshot.index_of(30))) == ["books", "music"]
+
+
+def test_encode_interests_counts_unknown_vocabulary(tmp_path):
+    path = str(tmp_path / "features.bin")
+    feature_snapshot.write_snapshot(path, PROFILES)
+    snapshot = feature_snapshot.FeatureSnapshot(path)
+
+    bits, unknown = snapshot.encode_interests(["music", "golf", "music"])
+    assert bits == snapshot.interest_bits(snapshot.index_of(10))
+    assert unknown == 1
+
+
+def test_wide_vocabularies_use_several_words(tmp_path):
+    path = str(tmp_path / "features.bin")
+    interests = [f"i{n}" for n in range(100)]
+    feature_snapshot.write_snapshot(path, [{"id": 1, "interests": interests}, {"id": 2, "interests": ["i99"]}])
+    snapshot = feature_snapshot.FeatureSnapshot(path)
+
+    assert snapshot.n_words == 2
+    assert sorted(snapshot.interests(0)) == sorted(interests)
+    assert snapshot.interests(1) == ["i99"]
+
+
+def test_rebuild_is_atomic_and_picked_up_by_readers(tmp_path):
+    path = str(tmp_path / "features.bin")
+    feature_snapshot.write_snapshot(path, PROFILES)
+    first = feature_snapshot.get_snapshot(path, recheck_seconds=0)
+    assert feature_snapshot.get_snapshot(path, recheck_seconds=0) is first
+
+    feature_snapshot.write_snapshot(path, PROFILES[:1])
+    second = feature_snapshot.get_snapshot(path, recheck_seconds=0)
+
+    assert second is not first
+    assert len(second) == 1
+    assert len(first) == 3  # el mapeo viejo sigue siendo válido para quien lo usa
+    assert [name for name in os.listdir(tmp_path)] == ["features.bin"]
+
+
+def test_rejects_files_that_are_not_snapshots(tmp_path):
+    path = tmp_path / "features.bin"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        feature_snapshot.FeatureSnapshot(str(path))
+
+
+def test_ids_outside_int32_are_rejected(tmp_path):
+    path = str(tmp_path / "features.bin")
+    with pytest.raises(ValueError):
+        feature_snapshot.write_snapshot(path, PROFILES + [{"id": 1 << 31, "interests": []}])
+    assert not os.path.exists(path)
+
+    feature_snapshot.write_snapshot(path, [{"id": 1, "gender_id": 1 << 40, "interests": []}])
+    snapshot = feature_snapshot.FeatureSnapshot(path)
+    assert snapshot.profile(0)["gender_id"] is None
@@ -0,0 +1,154 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from routers.matching_router import _ranking_response
+
+CURRENT_USER = {"id": 1, "sexual_orientation_id": 1, "interests": ["music", "travel"]}
+PROFILES = [
+    {"id": 2, "username": "ana", "gender_id": 2, "interests": ["music", "travel"]},
+    {"id": 3, "username": "eva", "gender_id": 2, "interests": ["music"]},
+    {"id": 4, "username": "luis", "gender_id": 1, "interests": ["music", "travel"]},
+]
+
+
+@pytest.fixture
+def client():
+    # Sin lifespan: /filter-compatible no usa la BD
+    return TestClient(main.app)
+
+
+def rank(client, **options):
+    response = client.post("/matching/filter-compatible", json={
+        "current_user": CURRENT_USER, "profiles": PROFILES, **options,
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_default_projection_returns_full_profiles(client):
+    body = rank(client)
+    assert body["profiles"] == PROFILES[:2]
+    assert body["count"] == 2
+
+
+def test_scores_and_ids_projections(client):
+    assert rank(client, fields="scores")["profiles"] == [{"id": 2, "score": 1.0}, {"id": 3, "score": 0.5}]
+    assert rank(client, fields="ids") == {"ids": [2, 3], "count": 2, "is_recycled": False}
+
+
+def test_include_score_does_not_leak_into_cached_rankings(client):
+    scored = rank(client, include_score=True, pool_version="v1")
+    assert scored["profiles"][0] == {**PROFILES[0], "score": 1.0}
+    # Mismo ranking desde la caché, sin el score de la petición anterior
+    assert rank(client, pool_version="v1")["profiles"] == PROFILES[:2]
+
+
+def test_unknown_projection_is_rejected(client):
+    response = client.post("/matching/filter-compatible", json={
+        "current_user": CURRENT_USER, "profiles": PROFILES, "fields": "everything",
+    })
+    assert response.status_code == 400
+
+
+def test_non_integer_seed_is_rejected(client):
+    for seed in ([1], {"a": 1}, "7", 1.5, True):
+        response = client.post("/matching/filter-compatible", json={
+            "current_user": CURRENT_USER, "profiles": PROFILES, "seed": seed, "pool_version": "v1",
+        })
+        assert response.status_code == 400, seed
+
+
+def test_projections_do_not_touch_cached_profiles():
+    ranked = [({"id": 2, "interests": ["a"]}, 0.5), ({"id": 3, "interests": ["b"]}, None)]
+
+    full = _ranking_response(ranked, False, include_score=True)["profiles"]
+    assert full[0] == {"id": 2, "interests": ["a"], "score": 0.5}
+    assert "score" not in ranked[0][0]
+    assert _ranking_response(ranked, False)["profiles"][0] is ranked[0][0]
+
+
+def test_approximate_requests_only_query_a_prebuilt_index(client, monkeypatch):
+    from config import settings
+    from routers import matching_router
+    import lsh
+
+    indexes = matching_router.ranking_cache.RankingCache(maxsize=1)
+    monkeypatch.setattr(settings, "LSH_MIN_POOL_SIZE", 1)
+    monkeypatch.setattr(matching_router, "_lsh_indexes", indexes)
+
+    assert matching_router.get_lsh_index(None, PROFILES) is None
+    matching_router.get_lsh_index("lsh-v0", PROFILES, wait=True)
+    assert matching_router.get_lsh_index("lsh-v1", PROFILES, wait=True) is not None
+    assert len(indexes) == 1  # LRU acotada: v1 expulsa a v0
+
+    def fail(*args, **kwargs):
+        raise AssertionError("el índice no se reconstruye por petición")
+
+    monkeypatch.setattr(lsh.LSHIndex, "update", fail)
+    body = rank(client, approximate=True, pool_version="lsh-v1", fields="scores")
+    assert body["profiles"][0] == {"id": 2, "score": 1.0}
+
+
+def test_lsh_indexes_are_built_one_at_a_time_keeping_the_latest_version(monkeypatch):
+    import threading
+    from routers import matching_router
+    import lsh
+
+    indexes = matching_router.ranking_cache.RankingCache(maxsize=4)
+    monkeypatch.setattr(matching_router, "_lsh_indexes", indexes)
+    release = threading.Event()
+    started, running, peak = [], [0], [0]
+    real_update = lsh.LSHIndex.update
+
+    def slow_update(self, profiles):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        started.append(profiles[0]["id"])
+        release.wait(5)
+        real_update(self, profiles)
+        running[0] -= 1
+
+    monkeypatch.setattr(lsh.LSHIndex, "update", slow_update)
+    pools = {version: [{**PROFILES[0], "id": version}] + PROFILES[1:] for version in (1, 2, 3)}
+    for version in (1, 2, 3):
+        assert matching_router.get_lsh_index(version, pools[version]) is None
+    builder = matching_router._lsh_builder
+    release.set()
+    builder.join(5)
+
+    assert peak[0] == 1
+    assert started == [1, 3]  # la 2 se sustituyó por la 3 mientras esperaba
+    assert matching_router.get_lsh_index(3, pools[3]) is not None
+    assert indexes.get(2) is None
+    assert matching_router._lsh_builder is None
+
+
+def test_snapshot_mode_defaults_to_scores_and_rejects_full(client, tmp_path, monkeypatch):
+    from config import settings
+    from routers import matching_router
+
+    monkeypatch.setattr(settings, "FEATURE_SNAPSHOT_PATH", str(tmp_path / "features.bin"))
+    assert client.post("/matching/internal/feature-snapshot", json={"profiles": PROFILES}).status_code == 200
+
+    body = rank(client, use_snapshot=True, seed=1234)
+    assert body["profiles"] == [{"id": 2, "score": 1.0}, {"id": 3, "score": 0.5}]
+    # La caché guarda solo (id, score), no perfiles decodificados del snapshot
+    cached = [value for key, (value, _) in matching_router._ranking_cache._data.items() if key[-1] == 1234]
+    assert cached == [([(2, 1.0), (3, 0.5)], False)]
+    assert rank(client, use_snapshot=True, fields="ids")["ids"] == [2, 3]
+
+    response = client.post("/matching/filter-compatible", json={
+        "current_user": CURRENT_USER, "use_snapshot": True, "fields": "full",
+    })
+    assert response.status_code == 400
+
+
+def test_snapshot_rebuild_rejects_ids_outside_int32(client, tmp_path, monkeypatch):
+    from config import settings
+
+    monkeypatch.setattr(settings, "FEATURE_SNAPSHOT_PATH", str(tmp_path / "features.bin"))
+    response = client.post("/matching/internal/feature-snapshot", json={
+        "profiles": PROFILES + [{"id": 2 ** 31, "gender_id": 2, "interests": []}],
+    })
+    assert response.status_code == 400
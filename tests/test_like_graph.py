@@ -0,0 +1,144 @@
+import random
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from db import Base
+from like_graph import LikeGraph
+import models
+
+
+def make_graph(edges, compact_threshold=10_000, background=False):
+    graph = LikeGraph(compact_threshold=compact_threshold, background=background)
+    graph.load_edges(edges)
+    return graph
+
+
+def test_likes_received_are_paginated_in_id_order():
+    graph = make_graph([(5, 1), (3, 1), (9, 1), (1, 3)])
+
+    assert graph.likes_received(1, skip=0, limit=2) == ([3, 5], 3)
+    assert graph.likes_received(1, skip=2, limit=2) == ([9], 3)
+    assert graph.likes_received(42) == ([], 0)
+
+
+def test_incremental_updates_are_merged_with_the_snapshot():
+    graph = make_graph([(2, 1), (3, 1), (1, 2)])
+
+    graph.add_like(4, 1)
+    graph.add_like(2, 1)        # ya estaba en el snapshot
+    graph.remove_like(3, 1)     # dislike posterior
+
+    assert graph.likes_received(1) == ([2, 4], 2)
+    assert graph.mutual_count(1) == 1
+
+    graph.add_like(1, 4)
+    assert graph.mutual_count(1) == 2
+
+    graph.remove_user(2)
+    assert graph.likes_received(1) == ([4], 1)
+    assert graph.mutual_count(1) == 1
+
+
+def test_updates_before_the_first_load_survive_it():
+    graph = LikeGraph(compact_threshold=1)
+    graph.add_like(7, 1)
+    graph.remove_like(8, 1)
+
+    graph.load_edges([(8, 1), (9, 1)])
+
+    assert graph.likes_received(1) == ([7, 9], 2)
+
+
+def test_compaction_keeps_the_same_answers():
+    graph = make_graph([(2, 1), (3, 1)], compact_threshold=3)
+    graph.add_like(4, 1)
+    graph.remove_like(2, 1)
+    graph.add_like(1, 3)  # dispara la compactación
+
+    assert graph._delta_size == 0
+    assert graph.likes_received(1) == ([3, 4], 2)
+    assert graph.mutual_count(1) == 1
+
+
+def test_updates_during_a_compaction_are_not_lost():
+    graph = make_graph([(2, 1), (3, 1)])
+    graph.add_like(4, 1)
+    graph.remove_like(2, 1)
+    graph.add_like(5, 1)
+    with graph._lock:
+        job = graph._claim_compaction(force=True)
+
+    # Swipes que llegan mientras se construyen los CSR nuevos
+    graph.remove_like(4, 1)
+    graph.add_like(2, 1)
+    graph.add_like(6, 1)
+    graph._compact(job)
+
+    assert graph.compactions == 1
+    assert graph.likes_received(1) == ([2, 3, 5, 6], 4)
+    assert graph._out.row(5).tolist() == [1]   # ya fusionado en el CSR
+    assert graph._added_in[1] == {2, 6}        # sigue en el delta
+
+
+def test_compaction_started_before_a_reload_is_discarded():
+    graph = make_graph([(2, 1)])
+    graph.add_like(3, 1)
+    with graph._lock:
+        job = graph._claim_compaction(force=True)
+    graph.load_edges([(9, 1)])
+    graph._compact(job)
+
+    assert graph.compactions == 0
+    assert graph.likes_received(1) == ([3, 9], 2)
+
+
+def test_refresh_sees_swipes_written_by_another_worker(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'matching.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    db.add(models.Swiped_Users(current_user_fk=2, swiped_user_fk=1, is_like=True, swipe_date=datetime(2024, 1, 1)))
+    db.commit()
+    graph = LikeGraph(background=False)
+    graph.load(db)
+    graph.add_like(3, 1)  # swipe atendido por este worker (ya confirmado)
+
+    # Otro worker confirma un like en su propia sesión
+    other = factory()
+    other.add(models.Swiped_Users(current_user_fk=4, swiped_user_fk=1, is_like=True, swipe_date=datetime(2024, 1, 2)))
+    other.add(models.Swiped_Users(current_user_fk=3, swiped_user_fk=1, is_like=True, swipe_date=datetime(2024, 1, 2)))
+    other.commit()
+    other.close()
+    assert graph.likes_received(1) == ([2, 3], 2)
+
+    graph.refresh(db)
+
+    assert graph.likes_received(1) == ([2, 3, 4], 3)
+    assert graph._delta_size == 0
+    db.close()
+
+
+def test_background_compaction_does_not_block_the_caller():
+    graph = make_graph([(2, 1)], compact_threshold=2, background=True)
+    graph.add_like(3, 1)
+    graph.add_like(4, 1)  # dispara la compactación en otro hilo
+    graph.join_compaction(timeout=5)
+
+    assert graph.compactions == 1
+    assert graph.likes_received(1) == ([2, 3, 4], 3)
+
+
+def test_memory_is_about_eight_bytes_per_like():
+    rng = random.Random(0)
+    edges = {(rng.randrange(1000), rng.randrange(1000)) for _ in range(50_000)}
+    graph = make_graph(edges)
+
+    senders = {s for s, _ in edges}
+    receivers = {r for _, r in edges}
+    # 4 B por arco y sentido + (nodo + offset) por fila y sentido + 2 offsets finales
+    expected = 4 * 2 * len(edges) + 4 * 2 * (len(senders) + len(receivers)) + 4 * 2
+    assert graph.nbytes() == expected
+    assert graph.edge_count() == len(edges)
+    assert graph.nbytes() / len(edges) < 9
@@ -0,0 +1,87 @@
+import pytest
+
+from benchmarks import loadtest
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+
+    assert loadtest.percentile(values, 50) == 50.0
+    assert loadtest.percentile(values, 99) == 99.0
+    assert loadtest.percentile([3.0], 95) == 3.0
+    assert loadtest.percentile([], 50) is None
+
+
+def test_ramp_profiles():
+    assert loadtest.start_offsets(4, "constant", 10) == [0.0] * 4
+    assert loadtest.start_offsets(4, "linear", 8) == [0.0, 2.0, 4.0, 6.0]
+    assert loadtest.start_offsets(8, "step", 8, steps=4) == [0.0, 0.0, 2.0, 2.0, 4.0, 4.0, 6.0, 6.0]
+    with pytest.raises(ValueError):
+        loadtest.start_offsets(4, "spike", 8)
+
+
+def test_parse_mix_rejects_unknown_actions():
+    assert loadtest.parse_mix("feed=3,swipe=1") == {"feed": 3.0, "swipe": 1.0}
+    with pytest.raises(ValueError):
+        loadtest.parse_mix("feed=1,boost=2")
+
+
+def test_report_counts_server_errors_per_endpoint():
+    recorder = loadtest.Recorder()
+    recorder.latencies["swipe"] = [0.01, 0.02, 0.03, 0.04]
+    recorder.errors["swipe"] = 1
+
+    report = recorder.report(elapsed=2.0)
+
+    assert report["requests"] == 4
+    assert report["endpoints"]["swipe"]["error_rate"] == 0.25
+    assert report["endpoints"]["swipe"]["throughput_rps"] == 2.0
+    assert report["endpoints"]["swipe"]["p50_ms"] == pytest.approx(20.0)
+
+
+def test_actions_without_a_request_yield_and_are_reported():
+    recorder = loadtest.Recorder()
+    user = {"id": 1}
+    timeline = {}
+
+    async def scenario():
+        timeline["deadline"] = loadtest.time.perf_counter() + 0.05
+
+        async def other_user():
+            await loadtest.asyncio.sleep(0)
+            timeline["other_ran_at"] = loadtest.time.perf_counter()
+
+        # Solo dismatch y sin relaciones: ninguna petición, pero debe ceder el loop
+        await loadtest.asyncio.gather(
+            loadtest.virtual_user(
+                None, recorder, user, [user], {"dismatch": 1.0}, loadtest.random.Random(0), timeline["deadline"]
+            ),
+            other_user(),
+        )
+
+    loadtest.asyncio.run(scenario())
+    assert timeline["other_ran_at"] < timeline["deadline"]
+    assert recorder.skipped["dismatch"] > 0
+    assert recorder.report(elapsed=1.0)["skipped"] == {"dismatch": recorder.skipped["dismatch"]}
+
+
+def test_swipes_mostly_target_other_active_virtual_users():
+    recorder = loadtest.Recorder()
+    population = [{"id": i} for i in range(1, 1001)]
+    targets = []
+
+    class Client:
+        async def request(self, method, url, **kwargs):
+            targets.append(kwargs["json"]["user_id"])
+            await loadtest.asyncio.sleep(0)
+            return loadtest.httpx.Response(201, json={"is_match": False})
+
+    deadline = loadtest.time.perf_counter() + 0.05
+    loadtest.asyncio.run(loadtest.virtual_user(
+        Client(), recorder, population[0], population, {"swipe": 1.0}, loadtest.random.Random(0), deadline,
+        peers=[2, 3, 4], peer_share=0.8,
+    ))
+
+    assert len(targets) > 50
+    assert 1 not in targets
+    assert sum(t in (2, 3, 4) for t in targets) / len(targets) > 0.7
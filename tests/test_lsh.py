@@ -0,0 +1,55 @@
+import pytest
+
+import lsh
+
+
+def test_signature_is_stable_and_order_independent():
+    hasher = lsh.MinHasher(num_perm=32, seed=7)
+    other = lsh.MinHasher(num_perm=32, seed=7)
+
+    assert hasher.signature(["music", "travel", "books"]) == other.signature(["books", "music", "travel"])
+    assert hasher.signature([]) is None
+
+
+def test_estimate_jaccard_tracks_exact_value():
+    hasher = lsh.MinHasher(num_perm=256)
+    a = [f"i{n}" for n in range(0, 20)]
+    b = [f"i{n}" for n in range(10, 30)]  # exact jaccard = 10 / 30
+
+    estimate = lsh.estimate_jaccard(hasher.signature(a), hasher.signature(b))
+    assert estimate == pytest.approx(1 / 3, abs=0.1)
+
+
+def test_index_retrieves_similar_profiles_and_handles_updates():
+    index = lsh.LSHIndex(num_perm=64, bands=32)
+    index.update([
+        {"id": 1, "interests": ["music", "travel", "books", "films"]},
+        {"id": 2, "interests": ["music", "travel", "books"]},
+        {"id": 3, "interests": ["chess", "golf"]},
+        {"id": 4, "interests": []},
+    ])
+
+    candidates = index.query(["music", "travel", "books", "films"])
+    assert {1, 2} <= candidates
+    assert 3 not in candidates
+    assert 4 not in candidates
+
+    index.add(3, ["music", "travel", "books", "films"])
+    assert 3 in index.query(["music", "travel", "books", "films"])
+
+    index.remove(1)
+    assert 1 not in index
+    assert 1 not in index.query(["music", "travel", "books", "films"])
+
+
+def test_index_rejects_bands_that_do_not_divide_num_perm():
+    with pytest.raises(ValueError):
+        lsh.LSHIndex(num_perm=64, bands=10)
+
+
+def test_recall_at_k_counts_ties_at_the_cutoff():
+    exact = {1: 0.9, 2: 0.5, 3: 0.5, 4: 0.1}
+
+    assert lsh.recall_at_k(exact, [1, 3], k=2) == 1.0
+    assert lsh.recall_at_k(exact, [1, 4], k=2) == 0.5
+    assert lsh.recall_at_k(exact, [], k=2) == 0.0
@@ -0,0 +1,73 @@
+import os
+
+import ranking_cache
+
+
+def test_cache_is_lru_and_counts_hits_misses_and_evictions():
+    cache = ranking_cache.RankingCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+
+    assert cache.get("a") == 1  # "a" pasa a ser el más reciente
+    cache.put("c", 3)           # expulsa "b"
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+    assert stats["hit_rate"] == 2 / 3
+
+
+def test_cache_is_bounded_by_retained_profiles():
+    cache = ranking_cache.RankingCache(maxsize=10, max_profiles=100)
+    cache.put("a", [], weight=60)
+    cache.put("b", [], weight=60)
+
+    assert cache.get("a") is None
+    assert cache.stats()["cached_profiles"] == 60
+
+    cache.put("too-big", [], weight=101)
+    assert cache.get("too-big") is None
+
+
+def test_none_key_bypasses_the_cache():
+    cache = ranking_cache.RankingCache(maxsize=2)
+    cache.put(None, 1)
+
+    assert cache.get(None) is None
+    stats = cache.stats()
+    assert stats["size"] == 0
+    assert stats["misses"] == 0
+    assert stats["bypassed"] == 1
+
+
+def test_versions_change_with_content_only():
+    profiles = [{"id": 1, "interests": ["a"]}, {"id": 2, "interests": ["b"]}]
+
+    assert ranking_cache.pool_version(profiles) == ranking_cache.pool_version([dict(p) for p in profiles])
+    assert ranking_cache.pool_version(profiles) != ranking_cache.pool_version(profiles[:1])
+    assert ranking_cache.excluded_version([3, 1, 2]) == ranking_cache.excluded_version([1, 2, 3, 3])
+
+
+def test_tie_breaker_is_deterministic_per_seed():
+    assert ranking_cache.tie_breaker(0, 1, 2) == ranking_cache.tie_breaker(0, 1, 2)
+    assert ranking_cache.tie_breaker(0, 1, 2) != ranking_cache.tie_breaker(1, 1, 2)
+
+
+def test_tie_breaker_does_not_depend_on_the_process_hash_seed():
+    import subprocess
+    import sys
+
+    code = "import ranking_cache; print(ranking_cache.tie_breaker(7, 'u-1', 'p-2'), ranking_cache.tie_breaker(7, 1, 2))"
+    outputs = {
+        subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(ranking_cache.__file__)),
+            env={**os.environ, "PYTHONHASHSEED": hash_seed},
+        ).stdout
+        for hash_seed in ("1", "2")
+    }
+    assert outputs == {f"{ranking_cache.tie_breaker(7, 'u-1', 'p-2')} {ranking_cache.tie_breaker(7, 1, 2)}\n"}
+
@@ -0,0 +1,175 @@
+import os
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from db import Base
+import models
+from swipe_buffer import SwipeBuffer
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'matching.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    db.add(models.Relationship_State(state="active"))
+    db.commit()
+    db.close()
+    return factory
+
+
+def make_buffer(session_factory, tmp_path, worker_id="w1"):
+    # flush_interval alto: los volcados solo ocurren cuando el test los pide
+    return SwipeBuffer(
+        session_factory, str(tmp_path / "swipes.log"), flush_interval=60, fsync=False, worker_id=worker_id
+    )
+
+
+def crash(buffer):
+    """El proceso muere: el SO cierra sus ficheros y suelta el flock"""
+    buffer._log.close()
+    buffer._lock_file.close()
+
+
+def test_match_is_detected_before_flush_and_written_in_one_commit(session_factory, tmp_path):
+    buffer = make_buffer(session_factory, tmp_path)
+    buffer.start()
+    db = session_factory()
+
+    assert buffer.record(db, 1, 2, True, datetime(2024, 1, 1)) is False
+    assert buffer.record(db, 2, 1, True, datetime(2024, 1, 2)) is True
+    assert db.query(models.Swiped_Users).count() == 0
+
+    assert buffer.flush() == 2
+    assert db.query(models.Swiped_Users).count() == 2
+    assert db.query(models.Couple_Relationship).count() == 1
+    buffer.stop()
+    db.close()
+
+
+class BarrierSession:
+    """Sesión que espera a la otra petición antes de su primera consulta"""
+
+    def __init__(self, session, barrier):
+        self._session = session
+        self._barrier = barrier
+
+    def query(self, *args, **kwargs):
+        if self._barrier is not None:
+            self._barrier.wait(timeout=5)
+            self._barrier = None
+        return self._session.query(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+def test_concurrent_reciprocal_likes_still_match(session_factory, tmp_path):
+    buffer = make_buffer(session_factory, tmp_path)
+    buffer.start()
+    # Las dos peticiones pasan el sondeo en memoria antes de que ninguna registre su like
+    barrier = threading.Barrier(2)
+    results = {}
+
+    def swipe(sender, receiver):
+        db = session_factory()
+        try:
+            results[(sender, receiver)] = buffer.record(
+                BarrierSession(db, barrier), sender, receiver, True, datetime(2024, 1, 1)
+            )
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=swipe, args=pair) for pair in ((1, 2), (2, 1))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results.values()) == [False, True]
+    buffer.flush()
+    db = session_factory()
+    assert db.query(models.Couple_Relationship).count() == 1
+    buffer.stop()
+    db.close()
+
+
+def test_log_is_replayed_after_a_crash(session_factory, tmp_path):
+    crashed = make_buffer(session_factory, tmp_path, worker_id="dead")
+    crashed.start()
+    db = session_factory()
+    crashed.record(db, 1, 2, True, datetime(2024, 1, 1))
+    crashed.record(db, 3, 4, False, datetime(2024, 1, 1))
+    crashed.record(db, 2, 1, True, datetime(2024, 1, 2))
+    # Sin stop(): el proceso "muere" con los swipes solo en el log
+    crash(crashed)
+
+    # Otro worker adopta el log huérfano
+    recovered = make_buffer(session_factory, tmp_path, worker_id="new")
+    recovered.start()
+
+    assert db.query(models.Swiped_Users).count() == 3
+    assert db.query(models.Couple_Relationship).count() == 1
+    assert not os.path.exists(crashed.log_path)
+    recovered.stop()
+    db.close()
+
+
+def test_forgotten_pairs_are_not_flushed_or_replayed(session_factory, tmp_path):
+    buffer = make_buffer(session_factory, tmp_path)
+    buffer.start()
+    db = session_factory()
+    buffer.record(db, 1, 2, True, datetime(2024, 1, 1))
+    buffer.record(db, 5, 6, True, datetime(2024, 1, 1))
+    buffer.forget_pair(2, 1)
+    crash(buffer)
+
+    replayed = make_buffer(session_factory, tmp_path)
+    replayed.start()
+
+    rows = db.query(models.Swiped_Users).all()
+    assert [(r.current_user_fk, r.swiped_user_fk) for r in rows] == [(5, 6)]
+    replayed.stop()
+    db.close()
+
+
+def test_workers_sharing_a_database_keep_matches_and_each_others_logs(session_factory, tmp_path):
+    worker_a = make_buffer(session_factory, tmp_path, worker_id="a")
+    worker_b = make_buffer(session_factory, tmp_path, worker_id="b")
+    worker_a.start()
+    worker_b.start()
+    db = session_factory()
+
+    # Cada worker solo ve su like: ninguno detecta el match al momento
+    assert worker_a.record(db, 1, 2, True, datetime(2024, 1, 1)) is False
+    assert worker_b.record(db, 2, 1, True, datetime(2024, 1, 1)) is False
+    worker_b.record(db, 7, 8, True, datetime(2024, 1, 1))
+    worker_a.flush()
+    worker_b.flush()
+    assert db.query(models.Couple_Relationship).count() == 1
+
+    # El volcado de A no toca el log de B
+    worker_b.record(db, 5, 6, True, datetime(2024, 1, 2))
+    worker_a.record(db, 3, 4, True, datetime(2024, 1, 2))
+    worker_a.flush()
+    worker_a.record(db, 9, 10, True, datetime(2024, 1, 2))
+    crash(worker_b)
+
+    # Un worker vivo no adopta el log de otro vivo; uno muerto sí
+    worker_c = make_buffer(session_factory, tmp_path, worker_id="c")
+    worker_c.start()
+    pairs = {(r.current_user_fk, r.swiped_user_fk) for r in db.query(models.Swiped_Users)}
+    assert (5, 6) in pairs
+    assert (9, 10) not in pairs
+    assert os.path.getsize(worker_a.log_path) > 0
+    assert db.query(models.Couple_Relationship).count() == 1
+
+    worker_a.stop()
+    worker_c.stop()
+    assert sorted(os.listdir(tmp_path)) == ["matching.db"]
+    db.close()
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from db import Base
+import models
+import swipe_retention
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'matching.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+def add_swipe(db, table, sender, receiver, is_like, date):
+    db.add(table(current_user_fk=sender, swiped_user_fk=receiver, is_like=is_like, swipe_date=date))
+    db.commit()
+
+
+def test_old_swipes_move_to_the_archive_in_batches(db):
+    now = datetime(2024, 6, 1)
+    for receiver in range(2, 7):
+        add_swipe(db, models.Swiped_Users, 1, receiver, receiver % 2 == 0, now - timedelta(days=400))
+    add_swipe(db, models.Swiped_Users, 1, 10, True, now - timedelta(days=3))
+
+    cutoff = swipe_retention.retention_cutoff(180, now=now)
+    result = swipe_retention.archive_old_swipes(db, cutoff, batch_size=2)
+
+    assert result["moved"] == 5
+    assert result["batches"] == 3
+    assert sorted(result["archived_likes"]) == [(1, 2), (1, 4), (1, 6)]
+    assert [r.swiped_user_fk for r in db.query(models.Swiped_Users)] == [10]
+    assert db.query(models.Swiped_Users_Archive).count() == 5
+
+
+def test_archiving_keeps_the_newest_version_of_a_pair(db):
+    now = datetime(2024, 6, 1)
+    add_swipe(db, models.Swiped_Users_Archive, 1, 2, False, now - timedelta(days=900))
+    add_swipe(db, models.Swiped_Users, 1, 2, True, now - timedelta(days=400))
+
+    swipe_retention.archive_old_swipes(db, swipe_retention.retention_cutoff(180, now=now))
+
+    archived = db.query(models.Swiped_Users_Archive).one()
+    assert archived.is_like is True
+    assert archived.swipe_date == now - timedelta(days=400)
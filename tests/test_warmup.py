@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import warmup
+from config import settings
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "WARMUP_RETRY_INITIAL_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "WARMUP_RETRY_MAX_SECONDS", 0.02)
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_ready_turns_200_once_a_retried_warm_up_succeeds(monkeypatch):
+    calls = []
+    database_up = threading.Event()
+
+    def flaky_warm_up(engine, session_factory):
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionError("database is starting up")
+        database_up.wait(5)
+        return {"create_all_ms": 0.0}
+
+    monkeypatch.setattr(warmup, "warm_up", flaky_warm_up)
+    with TestClient(main.app) as client:
+        assert wait_for(lambda: len(calls) >= 2)
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["warmup"]["attempts"] == 1
+        assert client.get("/health").status_code == 200
+
+        database_up.set()
+        assert wait_for(lambda: client.get("/ready").status_code == 200)
+        assert client.get("/ready").json()["warmup"]["attempts"] == 2
+
+
+def test_failing_warm_up_keeps_retrying_and_shutdown_does_not_hang(monkeypatch):
+    calls = []
+
+    def broken_warm_up(engine, session_factory):
+        calls.append(1)
+        raise ConnectionError("connection refused")
+
+    monkeypatch.setattr(warmup, "warm_up", broken_warm_up)
+    with TestClient(main.app) as client:
+        assert wait_for(lambda: len(calls) >= 3)
+        body = client.get("/ready").json()
+        assert body["status"] == "warming"
+        assert body["warmup"]["error"] == "connection refused"
+        assert body["warmup"]["attempts"] >= 2
@@ -0,0 +1,91 @@
+"""
+Warm-up del servicio antes de marcarlo como listo (`/ready`).
+
+Se ejecuta en segundo plano desde el lifespan de `main.app` para que el import
+del módulo y el arranque de uvicorn sigan siendo rápidos; `/health` responde
+desde el primer momento y `/ready` solo cuando esto ha terminado.
+"""
+import logging
+import time
+from typing import Any, Dict
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from db import Base
+import counters
+import models
+from routers import matching_router
+
+logger = logging.getLogger("uvicorn.error")
+
+# Id que no existe: las consultas calientes se ejecutan una vez para que
+# SQLAlchemy compile y cachee su SQL sin tocar datos reales.
+_SENTINEL_USER_ID = -1
+
+
+def open_pool_connections(engine: Engine) -> int:
+    """Abre a la vez `pool_size` conexiones y las devuelve al pool"""
+    size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+    connections = []
+    try:
+        for _ in range(size):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+def compile_hot_statements(session_factory: sessionmaker) -> None:
+    db = session_factory()
+    try:
+        matching_router.get_excluded_users(_SENTINEL_USER_ID, only_recent=True, recent_days=None, db=db)
+        matching_router.get_excluded_users(_SENTINEL_USER_ID, only_recent=False, recent_days=None, db=db)
+        matching_router.check_relationship(_SENTINEL_USER_ID, _SENTINEL_USER_ID - 1, db=db)
+        matching_router.get_active_relationship(_SENTINEL_USER_ID, db=db)
+        matching_router.get_connections_history(_SENTINEL_USER_ID, db=db)
+        counters.get_counters(db, [_SENTINEL_USER_ID])
+        # Sondeo recíproco de /swipe (solo lectura)
+        db.query(models.Swiped_Users).filter(
+            models.Swiped_Users.current_user_fk == _SENTINEL_USER_ID,
+            models.Swiped_Users.swiped_user_fk == _SENTINEL_USER_ID - 1,
+            models.Swiped_Users.is_like == True
+        ).first()
+    finally:
+        db.close()
+
+    # Ranking en memoria: ejercita el camino de /filter-compatible sin BD
+    matching_router.filter_compatible_profiles({
+        "current_user": {"id": _SENTINEL_USER_ID, "sexual_orientation_id": 2, "interests": ["warmup"]},
+        "profiles": [{"id": _SENTINEL_USER_ID - 1, "gender_id": 3, "interests": ["warmup"]}],
+    })
+
+
+def load_reference_data(session_factory: sessionmaker) -> None:
+    db = session_factory()
+    try:
+        for state in ("active", "inactive"):
+            matching_router.get_state_id(db, state)
+        matching_router.get_like_graph(db)
+    finally:
+        db.close()
+
+
+def warm_up(engine: Engine, session_factory: sessionmaker) -> Dict[str, Any]:
+    """Prepara el servicio y devuelve lo que tardó cada paso (en ms)"""
+    timings: Dict[str, Any] = {}
+
+    def step(name, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        timings[f"{name}_ms"] = round(1000 * (time.perf_counter() - start), 2)
+        return result
+
+    step("create_all", Base.metadata.create_all, engine)
+    step("swipe_buffer", matching_router.get_swipe_buffer)
+    timings["pool_connections"] = step("open_pool", open_pool_connections, engine)
+    step("compile_statements", compile_hot_statements, session_factory)
+    step("reference_data", load_reference_data, session_factory)
+    logger.info(f"[warmup] done {timings}")
+    return timings